@@ -1,9 +1,13 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
+import asyncio
+import json
 import os
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -18,14 +22,24 @@ try:
     from backend.services.rag_service import rag_service
     from backend.services.faq_service import faq_service
     from backend.services.auth_service import auth_service, get_admin_user, ADMIN_USERNAME, ADMIN_PASSWORD
+    from backend.utils.tenancy import resolve_namespace
+    from backend.utils.tracing import QueryTrace, new_request_id, start_trace, trace_recorder
 except ModuleNotFoundError:
     from utils.database import mongo_db
     from utils.vector_db import vector_db
     from services.rag_service import rag_service
     from services.faq_service import faq_service
     from services.auth_service import auth_service, get_admin_user, ADMIN_USERNAME, ADMIN_PASSWORD
+    from utils.tenancy import resolve_namespace
+    from utils.tracing import QueryTrace, new_request_id, start_trace, trace_recorder
 
 
+# Start RAG retrieval alongside the FAQ semantic check instead of after it
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1"
+
+# Limits for /query/batch
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "5000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
 
 app = FastAPI(title="Mini RAG API")
 
@@ -42,14 +56,32 @@ class IngestRequest(BaseModel):
     text: str
     source: Optional[str] = "paste"
     title: Optional[str] = None
+    namespace: Optional[str] = None
+
+class UpdateRequest(BaseModel):
+    text: str
+    source: Optional[str] = None
+    title: Optional[str] = None
 
 class QueryRequest(BaseModel):
     query: str
+    namespace: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    namespace: Optional[str] = None
+    concurrency: Optional[int] = None
 
 class LoginRequest(BaseModel):
     username: str
     password: str
 
+def get_namespace(namespace: Optional[str]) -> str:
+    try:
+        return resolve_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.on_event("startup")
 async def startup_db_client():
     try:
@@ -67,6 +99,10 @@ async def shutdown_db_client():
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics(admin: dict = Depends(get_admin_user)):
+    return {"mongo": mongo_db.get_latency_stats()}
+
 @app.post("/login")
 async def login(request: LoginRequest):
     # Fixed admin credentials from .env for this assignment
@@ -78,6 +114,7 @@ async def login(request: LoginRequest):
 
 @app.post("/ingest")
 async def ingest_text(request: IngestRequest, admin: dict = Depends(get_admin_user)):
+    namespace = get_namespace(request.namespace)
     try:
         # Generate title if not provided
         doc_title = request.title
@@ -87,32 +124,155 @@ async def ingest_text(request: IngestRequest, admin: dict = Depends(get_admin_us
         doc_id = await rag_service.ingest_text(request.text, {
             "source": request.source,
             "title": doc_title
-        })
+        }, namespace=namespace)
         return {"status": "success", "doc_id": doc_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/query") 
-async def query_rag(request: QueryRequest):
+@app.put("/documents/{doc_id}")
+async def update_document(doc_id: str, request: UpdateRequest, admin: dict = Depends(get_admin_user)):
+    # Only overwrite the metadata fields that were sent
+    metadata = {}
+    if request.source is not None:
+        metadata["source"] = request.source
+    if request.title is not None:
+        metadata["title"] = request.title
+
     try:
-        # 1. FAST FAQ LAYER
-        faq_result = await faq_service.get_answer(request.query)
-        if faq_result:
-             return {
-                 "answer": faq_result["answer"],
-                 "sources": [{"text": "FAQ Database", "metadata": {"source": "faq", "type": faq_result["source"]}}],
-                 "metrics": {
-                     "time_seconds": 0.05,
-                     "tokens": 0,
-                     "cost_estimate": 0.0
-                 }
-             }
-
-        # 2. SLOW RAG LAYER
-        result = await rag_service.query(request.query)
-        return result
+        result = await rag_service.update_document(doc_id, request.text, metadata)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"status": "success", **result}
+
+@app.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str, admin: dict = Depends(get_admin_user)):
+    try:
+        deleted = await rag_service.delete_document(doc_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"status": "success", "doc_id": doc_id}
+
+def _consume_result(task: asyncio.Task):
+    # Retrieval abandoned after an FAQ hit may still fail; don't log it as unhandled
+    if not task.cancelled():
+        task.exception()
+
+async def speculative_query(query: str, namespace: str) -> dict:
+    """
+    Runs FAQ matching and RAG retrieval side by side from one shared query
+    embedding. Retrieval is cancelled if the FAQ layer hits, and generation
+    only starts once the FAQ layer has definitely missed.
+    Returns the FAQ match on a hit (see answer_query).
+    """
+    start_time = time.time()
+
+    # 1. Exact FAQ hits need no embedding at all
+    faq_result = await faq_service.match_exact(query, namespace)
+    if faq_result:
+        return faq_result
+
+    # 2. One embedding feeds both layers
+    query_embedding = await rag_service.embed_query(query)
+    retrieval_task = asyncio.create_task(rag_service.retrieve(query, namespace, query_embedding))
+    retrieval_task.add_done_callback(_consume_result)
+
+    # Cancelled on an FAQ hit, and also if this request is itself cancelled
+    # (a no-op once retrieval has finished)
+    try:
+        try:
+            faq_result = await faq_service.match_semantic(query_embedding, namespace)
+        except Exception as e:
+            print(f"FAQ Semantic Check Failed: {e}")
+            faq_result = None
+
+        if faq_result:
+            return faq_result
+
+        # 3. FAQ missed: finish retrieval and pay for generation
+        retrieval = await retrieval_task
+    finally:
+        retrieval_task.cancel()
+    return await rag_service.generate(query, retrieval, start_time)
+
+async def answer_query(query: str, namespace: str) -> dict:
+    """
+    Returns the FAQ match on an FAQ hit, which the caller serializes with
+    faq_service.render / faq_service.response, or the RAG response.
+    """
+    if SPECULATIVE_RETRIEVAL:
+        return await speculative_query(query, namespace)
+
+    # 1. FAST FAQ LAYER
+    faq_result = await faq_service.get_answer(query, namespace)
+    if faq_result:
+        return faq_result
+
+    # 2. SLOW RAG LAYER
+    return await rag_service.query(query, namespace)
+
+def query_outcome(result: dict) -> str:
+    if "rendered" in result:
+        return result["source"]
+    return "rag"
+
+@app.post("/query") 
+async def query_rag(request: QueryRequest, response: Response, x_request_id: Optional[str] = Header(None)):
+    start_time = time.time()
+    namespace = get_namespace(request.namespace)
+    trace = QueryTrace((x_request_id or new_request_id())[:64], request.query, namespace)
+    response.headers["X-Request-ID"] = trace.request_id
+
+    with start_trace(trace):
+        try:
+            result = await answer_query(request.query, namespace)
+        except Exception as e:
+            trace.finish("error", str(e))
+            trace_recorder.record(trace)
+            raise HTTPException(status_code=500, detail=str(e), headers={"X-Request-ID": trace.request_id})
+
+    trace.finish(query_outcome(result))
+    trace_recorder.record(trace)
+    if "rendered" in result:
+        # FAQ hit: the body was serialized at index build time; only the
+        # timing is filled in here
+        return Response(
+            faq_service.render(result, time.time() - start_time),
+            media_type="application/json",
+            headers={"X-Request-ID": trace.request_id}
+        )
+    return result
+
+@app.post("/query/batch")
+async def query_batch(request: BatchQueryRequest, admin: dict = Depends(get_admin_user)):
+    namespace = get_namespace(request.namespace)
+    if len(request.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+    concurrency = min(request.concurrency or 8, BATCH_MAX_CONCURRENCY)
+
+    async def stream():
+        # One JSON object per line, flushed as each query finishes
+        try:
+            async for item in rag_service.query_batch(request.queries, namespace, concurrency):
+                yield json.dumps(item, default=str) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/traces")
+async def list_traces(limit: int = 50, slow_only: bool = False, admin: dict = Depends(get_admin_user)):
+    return {"traces": trace_recorder.recent(limit, slow_only)}
+
+@app.get("/traces/{request_id}")
+async def get_trace(request_id: str, admin: dict = Depends(get_admin_user)):
+    trace = trace_recorder.get(request_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found (it may have left the ring buffer)")
+    return trace
 
 if __name__ == "__main__":
     # If running `python main.py` from inside backend/, use local module path
@@ -0,0 +1,131 @@
+"""
+Compares chunking strategies on ingest cost and retrieval quality.
+
+The corpus is built from the generated FAQ dataset: FAQs are grouped into
+markdown documents ("## question" + answer). Every question variation is
+used as a query, and a chunk counts as relevant when it contains the
+expected answer. Embeddings come from the offline LocalAIService, so the
+numbers compare strategies with each other; they are not production
+quality figures.
+
+Usage (from the project root):
+    python -m backend.scripts.benchmark_chunking
+    python -m backend.scripts.benchmark_chunking --faqs-per-doc 40 --top-k 10
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from backend.services.chunking import build_chunker, token_length_function
+from backend.services.local_ai_service import LocalAIService
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "faqs_generated.json"
+
+CONFIGS = [
+    ("character", 1000, 150),
+    ("character", 1000, 0),
+    ("token", 256, 24),
+    ("token", 128, 16),
+    ("structure", 256, 24),
+    ("structure", 128, 0),
+]
+
+
+def build_corpus(faqs, faqs_per_doc):
+    documents = []
+    for start in range(0, len(faqs), faqs_per_doc):
+        group = faqs[start:start + faqs_per_doc]
+        documents.append("\n\n".join(f"## {faq['question']}\n{faq['answer']}" for faq in group))
+    queries = [(variation, faq["answer"]) for faq in faqs for variation in faq.get("variations", [])]
+    return documents, queries
+
+
+def run_config(strategy, chunk_size, chunk_overlap, documents, queries, ai, top_k):
+    count_tokens = token_length_function()
+    chunker = build_chunker(strategy, chunk_size, chunk_overlap)
+
+    # 1. Chunking
+    start = time.perf_counter()
+    chunks = [chunk for doc in documents for chunk in chunker.split_text(doc)]
+    chunk_seconds = time.perf_counter() - start
+
+    source_tokens = sum(count_tokens(doc) for doc in documents)
+    chunk_tokens = [count_tokens(chunk) for chunk in chunks]
+
+    # 2. Embedding (one call per chunk, like RAGService.ingest_text)
+    start = time.perf_counter()
+    matrix = np.array([ai.get_embeddings(chunk) for chunk in chunks], dtype=np.float32)
+    embed_seconds = time.perf_counter() - start
+
+    # 3. Retrieval quality
+    query_matrix = np.array([ai.get_query_embedding(q) for q, _ in queries], dtype=np.float32)
+    scores = query_matrix @ matrix.T
+    top = np.argsort(-scores, axis=1)[:, :top_k]
+
+    hits_at_1 = hits_at_k = 0
+    reciprocal_ranks = 0.0
+    for (query, answer), ranked in zip(queries, top):
+        for rank, chunk_idx in enumerate(ranked, 1):
+            if answer in chunks[chunk_idx]:
+                hits_at_1 += rank == 1
+                hits_at_k += 1
+                reciprocal_ranks += 1.0 / rank
+                break
+
+    n = len(queries)
+    return {
+        "strategy": strategy,
+        "size": chunk_size,
+        "overlap": chunk_overlap,
+        "chunks": len(chunks),
+        "avg_tokens": round(float(np.mean(chunk_tokens)), 1),
+        "max_tokens": int(max(chunk_tokens)),
+        "embedded_tokens": int(sum(chunk_tokens)),
+        "overlap_overhead_pct": round(100.0 * (sum(chunk_tokens) / source_tokens - 1), 1),
+        "chunk_ms": round(chunk_seconds * 1000, 1),
+        "embed_ms": round(embed_seconds * 1000, 1),
+        "docs_per_sec": round(len(documents) / (chunk_seconds + embed_seconds), 1),
+        "recall@1": round(hits_at_1 / n, 3),
+        f"recall@{top_k}": round(hits_at_k / n, 3),
+        "mrr": round(reciprocal_ranks / n, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faqs-per-doc", type=int, default=25)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    documents, queries = build_corpus(faqs, args.faqs_per_doc)
+    ai = LocalAIService()
+
+    results = [
+        run_config(strategy, size, overlap, documents, queries, ai, args.top_k)
+        for strategy, size, overlap in CONFIGS
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{len(documents)} documents, {len(queries)} queries\n")
+    columns = list(results[0])
+    widths = [max(len(col), *(len(str(r[col])) for r in results)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for r in results:
+        print("  ".join(str(r[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    main()
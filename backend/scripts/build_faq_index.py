@@ -0,0 +1,47 @@
+"""
+Builds the shared FAQ index before the API workers start, or publishes a
+new generation for running workers to pick up.
+
+Workers attach to the published files instead of each re-reading every
+embedding from Mongo. Run it as a prestart step with the same
+environment as the API (FAQ_SHARED_INDEX_DIR, FAQ_SCAN_MODE, MONGODB_URI):
+
+    python -m backend.scripts.build_faq_index            # build if FAQs changed
+    python -m backend.scripts.build_faq_index --force    # always publish a new generation
+    python -m backend.scripts.build_faq_index --namespace acme --namespace globex
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# Shared mode must be on before faq_service reads its settings
+os.environ["FAQ_SHARED_INDEX"] = "1"
+
+from backend.utils.database import mongo_db
+from backend.utils.tenancy import resolve_namespace
+from backend.services.faq_service import faq_service
+
+
+async def main(namespaces, force):
+    await mongo_db.connect()
+    try:
+        for namespace in namespaces:
+            index = await faq_service.build_index(namespace, force_rebuild=force)
+            print(f"Namespace '{namespace or 'default'}': generation {index.generation}, {len(index)} vectors.")
+    finally:
+        await mongo_db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--namespace", action="append", default=None,
+                        help="Tenant namespace to build (repeatable). Defaults to the default namespace.")
+    parser.add_argument("--force", action="store_true", help="Publish a new generation even if nothing changed")
+    args = parser.parse_args()
+
+    namespaces = [resolve_namespace(ns) for ns in (args.namespace or [None])]
+    asyncio.run(main(namespaces, args.force))
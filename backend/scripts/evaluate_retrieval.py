@@ -0,0 +1,263 @@
+"""
+Offline quality-vs-latency evaluation of the query pipeline. Sweeps the
+FAQ similarity threshold, RAG top_k/top_n and chunk size, and reports for
+each configuration:
+
+- FAQ hit precision / recall, plus the rate at which out-of-domain
+  queries are wrongly answered from the FAQ
+- retrieval recall@top_k (vector search), recall@top_n (after reranking)
+  and MRR over the reranked list
+- per-query latency (p50 / p95) and estimated generation cost per 1k queries
+
+Labelled queries come from the generated FAQ dataset. For every FAQ the
+last --holdout variations are removed from the FAQ index and used as
+paraphrase queries labelled with that FAQ, so they cannot hit the exact
+match table. A built-in set of out-of-domain questions serves as negatives.
+--queries adds a held-out JSONL set of {"query": ..., "faq_id": ...} lines
+(faq_id null for a negative).
+
+The RAG corpus is the same FAQs grouped into markdown documents, as in
+benchmark_chunking; a chunk is relevant when it contains the labelled FAQ's
+answer. Everything runs on the offline stand-ins (LocalAIService, in-memory
+vector and document stores), so latency covers our own code path only and
+the numbers compare configurations with each other; they are not
+production quality figures. Hashed stand-in embeddings also score
+paraphrases far lower than Gemini does, so thresholds do not carry over:
+--live-ai keeps the configured AI provider (stores stay in memory) to tune
+the threshold on real embedding scores.
+
+Usage (from the project root):
+    python -m backend.scripts.evaluate_retrieval
+    python -m backend.scripts.evaluate_retrieval --thresholds 0.7,0.75,0.8 --top-k 5,10 --top-n 3,5 --chunk-sizes 500,1000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# Stand-in providers must be selected before the services are imported
+if "--live-ai" not in sys.argv:
+    os.environ["AI_PROVIDER"] = "local"
+os.environ["VECTOR_DB_PROVIDER"] = "memory"
+os.environ["MONGO_PROVIDER"] = "memory"
+os.environ["FAQ_SHARED_INDEX"] = "0"
+
+from backend.scripts.benchmark_chunking import build_corpus
+from backend.services.ai_service import ai_service
+from backend.services.faq_service import FAQIndex, normalize_question
+from backend.services.rag_service import rag_service, CHUNKS_COLLECTION
+from backend.utils.database import mongo_db
+from backend.utils.tracing import QueryTrace, start_trace
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "faqs_generated.json"
+
+OUT_OF_DOMAIN = [
+    "What is the capital of Australia?",
+    "How do I bake sourdough bread at home?",
+    "Who won the football world cup in 2018?",
+    "What is the boiling point of water on Mount Everest?",
+    "Can you recommend a good science fiction novel?",
+    "How many moons does Jupiter have?",
+    "What is the best way to train a puppy?",
+    "Translate good night into Japanese",
+    "How do I change a flat tyre?",
+    "What are the symptoms of the common cold?",
+    "Write me a poem about autumn leaves",
+    "What time is sunset in Paris today?",
+    "How tall is the Eiffel Tower?",
+    "Which planet is closest to the sun?",
+    "How do I unclog a kitchen sink?",
+]
+
+
+def parse_list(value, cast):
+    return [cast(v) for v in value.split(",") if v.strip()]
+
+
+def split_faqs(faqs, holdout):
+    """FAQ index entries without their last `holdout` variations, and those variations as labelled queries."""
+    indexed, queries = [], []
+    for faq in faqs:
+        variations = faq.get("variations", [])
+        keep = max(len(variations) - holdout, 0) if len(variations) > 1 else len(variations)
+        indexed.append({**faq, "variations": variations[:keep]})
+        queries.extend({"query": v, "faq_id": faq["id"]} for v in variations[keep:])
+    return indexed, queries
+
+
+def load_queries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2) if values else 0.0
+
+
+async def match_faqs(index, queries):
+    """
+    Runs the FAQ layer once per query. The score is kept rather than a
+    decision, so every threshold is evaluated from the same run.
+    """
+    for item in queries:
+        start = time.perf_counter()
+        exact = index.match_exact(normalize_question(item["query"]))
+        item["embedding"] = ai_service.get_query_embedding(item["query"])
+        if exact:
+            item["faq_exact"], item["faq_score"], item["faq_pred"] = True, 1.0, exact["id"]
+        else:
+            score, entry = index.match_semantic(item["embedding"])
+            item["faq_exact"], item["faq_score"] = False, score
+            item["faq_pred"] = entry["id"] if entry else None
+        item["faq_ms"] = (time.perf_counter() - start) * 1000
+
+
+def faq_metrics(queries, threshold):
+    hits = [q for q in queries if q["faq_exact"] or q["faq_score"] >= threshold]
+    correct = sum(1 for q in hits if q["faq_id"] and q["faq_pred"] == q["faq_id"])
+    positives = sum(1 for q in queries if q["faq_id"])
+    negatives = [q for q in queries if not q["faq_id"]]
+    return {
+        "faq_precision": round(correct / len(hits), 3) if hits else 0.0,
+        "faq_recall": round(correct / positives, 3) if positives else 0.0,
+        "faq_false_hit_rate": round(sum(1 for q in hits if not q["faq_id"]) / len(negatives), 3) if negatives else 0.0,
+    }
+
+
+async def ingest_corpus(documents, chunk_size, namespace):
+    rag_service.chunkers.default_profile = {
+        "strategy": "character",
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_size * 15 // 100
+    }
+    for i, text in enumerate(documents):
+        await rag_service.ingest_text(text, {"source": "eval", "title": f"FAQ page {i + 1}"}, namespace=namespace)
+    rows = await mongo_db.find_documents(CHUNKS_COLLECTION, {"namespace": namespace}, {"_id": 0, "chunk_id": 1, "text": 1})
+    return {row["chunk_id"]: row["text"] for row in rows}
+
+
+async def run_rag(queries, answers, chunk_texts, namespace, top_k, top_n):
+    """Retrieval + generation for every query; returns per-query measurements."""
+    rag_service.top_k, rag_service.top_n = top_k, top_n
+    rag_service.chunk_cache.clear()
+
+    runs = []
+    for item in queries:
+        trace = QueryTrace("eval", item["query"], namespace)
+        start = time.perf_counter()
+        with start_trace(trace):
+            retrieval = await rag_service.retrieve(item["query"], namespace, item["embedding"])
+            result = await rag_service.generate(item["query"], retrieval, time.time())
+        run = {
+            "ms": (time.perf_counter() - start) * 1000,
+            "cost": result["metrics"]["cost_estimate"],
+            "retrieved_rank": None,
+            "reranked_rank": None
+        }
+        answer = answers.get(item["faq_id"])
+        if answer:
+            retrieved = [chunk_texts.get(m["id"], "") for m in trace.retrieval]
+            reranked = [chunk_texts.get(m["id"], "") for m in trace.rerank]
+            run["retrieved_rank"] = next((r for r, text in enumerate(retrieved, 1) if answer in text), None)
+            run["reranked_rank"] = next((r for r, text in enumerate(reranked, 1) if answer in text), None)
+        runs.append(run)
+    return runs
+
+
+def config_row(threshold, chunk_size, top_k, top_n, queries, runs):
+    labelled = [(q, r) for q, r in zip(queries, runs) if q["faq_id"]]
+    n = len(labelled) or 1
+    latencies, cost = [], 0.0
+    for item, run in zip(queries, runs):
+        if item["faq_exact"] or item["faq_score"] >= threshold:
+            latencies.append(item["faq_ms"])
+        else:
+            latencies.append(item["faq_ms"] + run["ms"])
+            cost += run["cost"]
+    faq_hits = len(queries) - sum(1 for q in queries if not q["faq_exact"] and q["faq_score"] < threshold)
+
+    return {
+        "threshold": threshold,
+        "chunk_size": chunk_size,
+        "top_k": top_k,
+        "top_n": top_n,
+        **faq_metrics(queries, threshold),
+        "rag_share": round(1 - faq_hits / len(queries), 3),
+        "recall@k": round(sum(1 for _, r in labelled if r["retrieved_rank"]) / n, 3),
+        "recall@n": round(sum(1 for _, r in labelled if r["reranked_rank"]) / n, 3),
+        "mrr": round(sum(1.0 / r["reranked_rank"] for _, r in labelled if r["reranked_rank"]) / n, 3),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "cost_per_1k": round(cost / len(queries) * 1000, 6),
+    }
+
+
+async def main(args):
+    with open(args.faqs, "r", encoding="utf-8") as f:
+        faqs = json.load(f)
+
+    indexed, queries = split_faqs(faqs, args.holdout)
+    queries += [{"query": q, "faq_id": None} for q in OUT_OF_DOMAIN]
+    if args.queries:
+        queries += load_queries(args.queries)
+
+    # 1. FAQ layer, built without the held-out variations
+    with tempfile.TemporaryDirectory() as tmp:
+        faq_path = Path(tmp) / "faqs.json"
+        faq_path.write_text(json.dumps(indexed), encoding="utf-8")
+        index = FAQIndex("eval", faq_path, "faq_eval_store")
+        await index.load()
+    await match_faqs(index, queries)
+
+    # 2. RAG layer, one corpus per chunk size
+    documents, _ = build_corpus(faqs, args.faqs_per_doc)
+    answers = {faq["id"]: faq["answer"] for faq in faqs}
+    rows = []
+    for chunk_size in parse_list(args.chunk_sizes, int):
+        namespace = f"eval-{chunk_size}"
+        chunk_texts = await ingest_corpus(documents, chunk_size, namespace)
+        for top_k, top_n in itertools.product(parse_list(args.top_k, int), parse_list(args.top_n, int)):
+            if top_n > top_k:
+                continue
+            runs = await run_rag(queries, answers, chunk_texts, namespace, top_k, top_n)
+            rows.extend(
+                config_row(threshold, chunk_size, top_k, top_n, queries, runs)
+                for threshold in parse_list(args.thresholds, float)
+            )
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    labelled = sum(1 for q in queries if q["faq_id"])
+    print(f"{len(indexed)} FAQs, {labelled} labelled queries, {len(queries) - labelled} negatives, "
+          f"{len(documents)} RAG documents\n")
+    columns = list(rows[0])
+    widths = [max(len(col), *(len(str(r[col])) for r in rows)) for col in columns]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r[col]).ljust(w) for col, w in zip(columns, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faqs", default=str(DATA_PATH), help="FAQ dataset (JSON list)")
+    parser.add_argument("--holdout", type=int, default=1, help="Variations per FAQ held out as queries")
+    parser.add_argument("--queries", help="Extra held-out queries (JSONL with query and faq_id)")
+    parser.add_argument("--faqs-per-doc", type=int, default=25)
+    parser.add_argument("--thresholds", default="0.3,0.4,0.5,0.65,0.75,0.85")
+    parser.add_argument("--top-k", default="5,10,20")
+    parser.add_argument("--top-n", default="3,5")
+    parser.add_argument("--chunk-sizes", default="500,1000,1500")
+    parser.add_argument("--live-ai", action="store_true", help="Use the configured AI provider instead of LocalAIService")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""
+Re-runs queries from the slow-query log against the offline stand-in
+providers (LocalAIService, in-memory vector and document stores). For each
+query it compares the replayed decision and stage timings with the logged
+trace, which shows whether the slowness is in our own code path or in an
+external provider.
+
+The stand-in stores start empty. The FAQ index is built from
+data/faqs.json, and --corpus files (.txt/.md, or directories of them) are
+ingested into every namespace that appears in the log.
+
+Usage (from the project root):
+    python -m backend.scripts.replay_slow_queries
+    python -m backend.scripts.replay_slow_queries --log backend/logs/slow_queries.jsonl --corpus docs/ --limit 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# Stand-in providers must be selected before the services are imported
+os.environ["AI_PROVIDER"] = "local"
+os.environ["VECTOR_DB_PROVIDER"] = "memory"
+os.environ["MONGO_PROVIDER"] = "memory"
+os.environ["FAQ_SHARED_INDEX"] = "0"
+
+from backend.main import answer_query, query_outcome
+from backend.services.faq_service import faq_service
+from backend.services.rag_service import rag_service
+from backend.utils.tracing import QueryTrace, start_trace, SLOW_QUERY_LOG
+
+
+def load_traces(path: Path, limit: int):
+    traces = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                traces.append(json.loads(line))
+    return traces[-limit:] if limit else traces
+
+
+def corpus_files(paths):
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob("*") if p.suffix in (".txt", ".md"))
+        elif path.exists():
+            yield path
+
+
+def slowest_stage(stages):
+    if not stages:
+        return "-"
+    name, ms = max(stages.items(), key=lambda item: item[1])
+    return f"{name} {ms:.0f}ms"
+
+
+def compare(logged, replayed):
+    return {
+        "request_id": logged["request_id"],
+        "query": logged["query"],
+        "logged_outcome": logged.get("outcome"),
+        "replay_outcome": replayed["outcome"],
+        "logged_faq_score": (logged.get("faq") or {}).get("score"),
+        "replay_faq_score": replayed["faq"].get("score"),
+        "logged_ms": logged.get("total_ms"),
+        "replay_ms": replayed["total_ms"],
+        "logged_slowest": slowest_stage(logged.get("stages_ms")),
+        "replay_slowest": slowest_stage(replayed["stages_ms"]),
+        "replay_stages_ms": replayed["stages_ms"],
+    }
+
+
+async def main(args):
+    traces = load_traces(Path(args.log), args.limit)
+    if not traces:
+        print(f"No traces in {args.log}")
+        return
+
+    await faq_service.initialize()
+    namespaces = {t.get("namespace", "") for t in traces}
+    for path in corpus_files(args.corpus):
+        text = path.read_text(encoding="utf-8")
+        for namespace in namespaces:
+            await rag_service.ingest_text(text, {"source": "replay", "title": path.name}, namespace=namespace)
+
+    rows = []
+    for logged in traces:
+        trace = QueryTrace(logged["request_id"], logged["query"], logged.get("namespace", ""))
+        with start_trace(trace):
+            try:
+                result = await answer_query(trace.query, trace.namespace)
+                trace.finish(query_outcome(result))
+            except Exception as e:
+                trace.finish("error", str(e))
+        rows.append(compare(logged, trace.to_dict()))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    for row in rows:
+        print(f"{row['request_id'][:12]}  {row['query'][:50]!r}")
+        print(f"    outcome   {row['logged_outcome']} -> {row['replay_outcome']}"
+              f"   faq score {row['logged_faq_score']} -> {row['replay_faq_score']}")
+        print(f"    total     {row['logged_ms']} ms -> {row['replay_ms']} ms"
+              f"   slowest {row['logged_slowest']} -> {row['replay_slowest']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=str(SLOW_QUERY_LOG), help="Slow-query JSONL log")
+    parser.add_argument("--corpus", action="append", default=[], help="File or directory to ingest (repeatable)")
+    parser.add_argument("--limit", type=int, default=0, help="Only replay the last N traces")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -76,6 +76,28 @@ class AIService:
                 return result['embedding']
             raise e
 
+    def get_query_embeddings(self, queries: list, batch_size: int = 100):
+        """Embeds many queries with one API call per batch (the API caps a batch at 100)."""
+        embeddings = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            try:
+                result = genai.embed_content(
+                    model=self.embedding_model_name,
+                    content=batch,
+                    task_type="retrieval_query"
+                )
+            except exceptions.InvalidArgument as e:
+                if "not found" not in str(e).lower():
+                    raise e
+                result = genai.embed_content(
+                    model='models/embedding-001',
+                    content=batch,
+                    task_type="retrieval_query"
+                )
+            embeddings.extend(result['embedding'])
+        return embeddings
+
     def rerank(self, query: str, documents: list, top_n: int = 5):
         """Uses Cohere to rerank retrieved documents for higher precision."""
         if not self.co or not documents:
@@ -114,17 +136,30 @@ class AIService:
             
             # Get token usage metrics
             tokens = 0
+            prompt_tokens = 0
             if hasattr(response, 'usage_metadata'):
                 tokens = response.usage_metadata.total_token_count
+                prompt_tokens = response.usage_metadata.prompt_token_count
             
             return {
                 "answer": answer_text,
-                "tokens": tokens
+                "tokens": tokens,
+                "prompt_tokens": prompt_tokens
             }
         except Exception as e:
             return {
                 "answer": f"Error generating answer: {str(e)}",
-                "tokens": 0
+                "tokens": 0,
+                "prompt_tokens": 0
             }
 
-ai_service = AIService()
+# AI_PROVIDER=local swaps in the offline stand-in (no API keys needed) for
+# evaluation and replay runs
+if os.getenv("AI_PROVIDER") == "local":
+    try:
+        from backend.services.local_ai_service import LocalAIService
+    except ModuleNotFoundError:
+        from services.local_ai_service import LocalAIService
+    ai_service = LocalAIService()
+else:
+    ai_service = AIService()
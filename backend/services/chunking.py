@@ -0,0 +1,188 @@
+import os
+import re
+import json
+from typing import Callable, Dict, List, Optional
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+# Sizes are in characters for the "character" strategy and in tokens for
+# "token" and "structure". 256 tokens is roughly the 1000 characters the
+# original splitter used, with a smaller overlap.
+DEFAULT_PROFILES = {
+    "character": {"chunk_size": 1000, "chunk_overlap": 150},
+    "token": {"chunk_size": 256, "chunk_overlap": 24},
+    "structure": {"chunk_size": 256, "chunk_overlap": 24},
+}
+
+TOKEN_ENCODING = os.getenv("CHUNK_TOKEN_ENCODING", "cl100k_base")
+
+_HEADING = re.compile(r"^\s{0,3}(#{1,6}\s+.+|[A-Z][^\n]{0,80}:)\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+
+_token_length: Optional[Callable[[str], int]] = None
+
+
+def token_length_function() -> Callable[[str], int]:
+    """
+    Returns a tiktoken-based token counter. If the encoding cannot be
+    loaded (e.g. an offline container), falls back to ~4 characters per token.
+    """
+    global _token_length
+    if _token_length is None:
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            _token_length = lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            print(f"tiktoken unavailable ({e}); approximating tokens as chars/4.")
+            _token_length = lambda text: max(1, (len(text) + 3) // 4)
+    return _token_length
+
+
+class StructureAwareSplitter:
+    """
+    Splits on headings first, then packs whole sentences up to chunk_size.
+    A chunk never spans two sections, and each chunk after the first in a
+    section repeats the section heading so it can be retrieved on its own.
+    Overlap is made of whole trailing sentences.
+    """
+    def __init__(self, chunk_size: int, chunk_overlap: int, length_function: Callable[[str], int]):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        # Fallback for single sentences that are longer than a chunk, one per
+        # budget (chunk_size minus the heading prefix)
+        self._long_sentence_splitters: Dict[int, RecursiveCharacterTextSplitter] = {}
+
+    def _long_sentence_splitter(self, budget: int) -> RecursiveCharacterTextSplitter:
+        splitter = self._long_sentence_splitters.get(budget)
+        if splitter is None:
+            splitter = self._long_sentence_splitters[budget] = RecursiveCharacterTextSplitter(
+                chunk_size=budget,
+                chunk_overlap=min(self.chunk_overlap, budget // 2),
+                length_function=self.length_function,
+            )
+        return splitter
+
+    def _sections(self, text: str):
+        heading = None
+        lines = []
+        for line in text.splitlines():
+            if _HEADING.match(line) and len(line.strip()) > 1:
+                if lines:
+                    yield heading, "\n".join(lines)
+                heading, lines = line.strip(), []
+            else:
+                lines.append(line)
+        if lines or heading:
+            yield heading, "\n".join(lines)
+
+    def _sentences(self, body: str, budget: int) -> List[str]:
+        sentences = []
+        for paragraph in re.split(r"\n\s*\n", body):
+            paragraph = " ".join(paragraph.split())
+            if not paragraph:
+                continue
+            for sentence in _SENTENCE_END.split(paragraph):
+                if self.length_function(sentence) > budget:
+                    sentences.extend(self._long_sentence_splitter(budget).split_text(sentence))
+                else:
+                    sentences.append(sentence)
+        return sentences
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        # Sentences are joined with a space, which counts against the budget
+        separator_len = self.length_function(" ")
+        for heading, body in self._sections(text):
+            prefix = f"{heading}\n" if heading else ""
+            budget = self.chunk_size - (self.length_function(prefix) if prefix else 0)
+            if prefix and budget < self.chunk_size // 2:
+                # Heading too long to repeat in every chunk; keep it on its own
+                chunks.extend(self._long_sentence_splitter(self.chunk_size).split_text(heading))
+                prefix, budget = "", self.chunk_size
+
+            current: List[str] = []
+            current_len = 0
+            for sentence in self._sentences(body, budget):
+                sentence_len = self.length_function(sentence)
+                if current and current_len + separator_len + sentence_len > budget:
+                    chunks.append(prefix + " ".join(current))
+                    # Carry whole trailing sentences as overlap
+                    carried: List[str] = []
+                    carried_len = 0
+                    for prev in reversed(current):
+                        prev_len = self.length_function(prev) + separator_len
+                        if carried_len + prev_len > self.chunk_overlap:
+                            break
+                        carried.insert(0, prev)
+                        carried_len += prev_len
+                    # Drop carried sentences until the next one fits the budget
+                    while carried and carried_len + sentence_len > budget:
+                        carried_len -= self.length_function(carried.pop(0)) + separator_len
+                    current, current_len = carried, carried_len
+                elif current:
+                    current_len += separator_len
+                current.append(sentence)
+                current_len += sentence_len
+
+            if current:
+                chunks.append(prefix + " ".join(current))
+            elif prefix:
+                chunks.append(heading)
+        return chunks
+
+
+def build_chunker(strategy: str = "character", chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None):
+    """Builds a splitter exposing split_text(text) -> List[str]."""
+    if strategy not in DEFAULT_PROFILES:
+        raise ValueError(f"Unknown chunking strategy '{strategy}'. Use one of: {', '.join(DEFAULT_PROFILES)}")
+
+    defaults = DEFAULT_PROFILES[strategy]
+    chunk_size = chunk_size or defaults["chunk_size"]
+    chunk_overlap = defaults["chunk_overlap"] if chunk_overlap is None else chunk_overlap
+
+    if strategy == "character":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+            is_separator_regex=False,
+        )
+    if strategy == "token":
+        return RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=token_length_function(),
+            is_separator_regex=False,
+        )
+    return StructureAwareSplitter(chunk_size, chunk_overlap, token_length_function())
+
+
+class ChunkerRegistry:
+    """
+    Picks a chunker per document source.
+
+    CHUNK_STRATEGY / CHUNK_SIZE / CHUNK_OVERLAP set the default, and
+    CHUNKING_PROFILES (JSON) overrides it per source, e.g.
+    {"pdf": {"strategy": "structure", "chunk_size": 300, "chunk_overlap": 30}}
+    """
+    def __init__(self):
+        self.default_profile = {
+            "strategy": os.getenv("CHUNK_STRATEGY", "character"),
+            "chunk_size": int(os.getenv("CHUNK_SIZE", "0")) or None,
+            "chunk_overlap": int(os.getenv("CHUNK_OVERLAP")) if os.getenv("CHUNK_OVERLAP") else None,
+        }
+        self.source_profiles: Dict[str, dict] = json.loads(os.getenv("CHUNKING_PROFILES", "{}"))
+        self._chunkers = {}
+
+    def for_source(self, source: Optional[str] = None):
+        profile = self.source_profiles.get(source or "", self.default_profile)
+        key = (profile.get("strategy", "character"), profile.get("chunk_size"), profile.get("chunk_overlap"))
+        chunker = self._chunkers.get(key)
+        if chunker is None:
+            chunker = self._chunkers[key] = build_chunker(*key)
+        return chunker
+
+    def split_text(self, text: str, source: Optional[str] = None) -> List[str]:
+        return self.for_source(source).split_text(text)
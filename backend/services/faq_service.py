@@ -1,236 +1,691 @@
+import os
 import json
 import re
-import math
+import time
 import hashlib
 import asyncio
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, NamedTuple
+import numpy as np
+from pymongo import IndexModel
 
 try:
     from backend.services.ai_service import ai_service
     from backend.utils.database import mongo_db
+    from backend.utils.tenancy import DEFAULT_NAMESPACE, TENANT_DATA_DIR
+    from backend.utils.quantization import (
+        normalize_rows, to_float16_blob, from_float16_blob, quantize_int8, binary_codes,
+        hamming_distances, scan_float16, scan_int8, top_candidates, best_matches_float16
+    )
+    from backend.utils.shared_index import SharedIndexStore, default_shared_dir
+    from backend.utils.tracing import get_current_trace, trace_stage
 except ModuleNotFoundError:
     from services.ai_service import ai_service
     from utils.database import mongo_db
+    from utils.tenancy import DEFAULT_NAMESPACE, TENANT_DATA_DIR
+    from utils.quantization import (
+        normalize_rows, to_float16_blob, from_float16_blob, quantize_int8, binary_codes,
+        hamming_distances, scan_float16, scan_int8, top_candidates, best_matches_float16
+    )
+    from utils.shared_index import SharedIndexStore, default_shared_dir
+    from utils.tracing import get_current_trace, trace_stage
 
-class FAQService:
-    def __init__(self):
-        self.faqs = []
-        self.faq_embeddings = [] # List of (embedding, faq_entry) tuples
-        self.exact_match_map = {}
-        self.similarity_threshold = 0.75 
-        self.collection_name = "faq_vector_store"
-        
-        # Load JSON config immediately
-        self._load_json_config()
-        
-    async def initialize(self):
-        print("Initializing FAQ Service...")
-        
+DATA_DIR = Path(__file__).parent.parent / "data"
+DEFAULT_COLLECTION = "faq_vector_store"
+FAQ_STORE_INDEXES = [IndexModel([("faq_id", 1), ("content_hash", 1)])]
+
+# float16: scan the float16 vectors directly.
+# int8 / binary: cheap first pass over int8 or sign-bit codes, then re-score
+# the FAQ_RESCORE_TOP best candidates against the float16 vectors.
+FAQ_SCAN_MODE = os.getenv("FAQ_SCAN_MODE", "float16")
+FAQ_RESCORE_TOP = int(os.getenv("FAQ_RESCORE_TOP", "16"))
+
+# With several uvicorn workers, build the FAQ index once into memory-mapped
+# files that every worker attaches to read-only. Workers pick up a newer
+# generation (e.g. from scripts/build_faq_index.py) within the refresh period.
+FAQ_SHARED_INDEX = os.getenv("FAQ_SHARED_INDEX", "0") == "1"
+FAQ_SHARED_INDEX_DIR = Path(os.getenv("FAQ_SHARED_INDEX_DIR") or default_shared_dir())
+FAQ_SHARED_REFRESH_SECONDS = float(os.getenv("FAQ_SHARED_REFRESH_SECONDS", "5"))
+
+FAQ_SOURCE_TYPES = ("faq_exact", "faq_semantic")
+GREETING_TEMPLATE = "{{TIME_AWARE_GREETING}}"
+GREETING_ANSWERS = {
+    "morning": "Good morning! How can I help you today?",
+    "afternoon": "Good afternoon! How can I help you today?",
+    "evening": "Good evening! How can I help you today?",
+}
+
+# FAQ hits are served as pre-serialized /query responses. The bytes are
+# rendered once per answer and source type, up to "time_seconds":, and the
+# measured time plus this suffix are appended per request.
+FAQ_RESPONSE_SUFFIX = b',"tokens":0,"cost_estimate":0.0}}'
+
+
+def normalize_question(text: str) -> str:
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    return text.strip()
+
+
+def exact_match_key(normalized_q: str) -> np.uint64:
+    """64-bit hash of a normalized question, for the shared exact-match table."""
+    digest = hashlib.blake2b(normalized_q.encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+
+def greeting_bucket() -> str:
+    """morning / afternoon / evening, by server time."""
+    hour = datetime.now().hour
+    if 5 <= hour < 12:
+        return "morning"
+    elif 12 <= hour < 17:
+        return "afternoon"
+    return "evening"
+
+
+def render_faq_prefix(answer: str, source: str) -> bytes:
+    """A /query response for an FAQ answer, serialized up to the time_seconds value."""
+    head = json.dumps({
+        "answer": answer,
+        "sources": [{"text": "FAQ Database", "metadata": {"source": "faq", "type": source}}]
+    }, ensure_ascii=False, separators=(",", ":"))
+    return (head[:-1] + ',"metrics":{"time_seconds":').encode("utf-8")
+
+
+# Greetings all share the template answer, so one set of variants covers them
+RENDERED_GREETINGS = {
+    bucket: {source: render_faq_prefix(answer, source) for source in FAQ_SOURCE_TYPES}
+    for bucket, answer in GREETING_ANSWERS.items()
+}
+
+
+def generate_greeting_faqs() -> List[Dict]:
+    """Generates 200+ greeting variations."""
+    base_greetings = [
+        "hi", "hello", "hey", "good morning", "good afternoon", "good evening",
+        "namaste", "yo", "hiya", "howdy", "greetings", "what's up", "sup", "heya",
+        "hola", "bonjour", "hallo", "gday", "what is up", "hey there", "hello there"
+    ]
+
+    modifiers = ["", "!", ".", " there", " bot", " ai", " assistant", " friend", " buddy", " mate", " sir", " maam"]
+    typos = ["hy", "hlo", "heyy", "heyyy", "hii", "hiii", "hlw", "hie"]
+
+    greetings = []
+
+    # 1. Combine base + modifiers
+    for g in base_greetings:
+        for m in modifiers:
+            txt = f"{g}{m}".strip()
+            greetings.append(txt)
+
+    # 2. Add Typos
+    greetings.extend(typos)
+
+    # 3. Construct FAQ Entries
+    faq_entries = []
+    for i, g_text in enumerate(greetings, 1):
+        faq_entries.append({
+            "id": f"greeting_gen_{i}",
+            "question": g_text,
+            "variations": [],
+            "answer": GREETING_TEMPLATE,
+            "type": "greeting"
+        })
+
+    return faq_entries
+
+
+class FAQSnapshot(NamedTuple):
+    """
+    Everything a lookup reads, as one immutable value. Rebuilds and shared
+    index refreshes swap in a new snapshot with a single assignment, and a
+    lookup reads the reference once, so a scan running in a worker thread
+    never mixes rows from one generation with entries from another.
+
+    Row i of every matrix belongs to entries[i]. Vectors are L2-normalized
+    float16; the int8 / binary codes are only built when FAQ_SCAN_MODE uses
+    them as a first pass. A snapshot attached from a shared (memory-mapped)
+    index matches exact questions through sorted 64-bit hashes instead of
+    exact_match_map.
+    """
+    entries: List[Dict] = []
+    vectors: Optional[np.ndarray] = None
+    int8_vectors: Optional[np.ndarray] = None
+    int8_scales: Optional[np.ndarray] = None
+    binary_codes: Optional[np.ndarray] = None
+    all_entries: List[Dict] = []
+    exact_match_map: Dict[str, Dict] = {}
+    exact_keys: Optional[np.ndarray] = None
+    exact_entry_ids: Optional[np.ndarray] = None
+    # entry id -> {source type: pre-rendered response prefix}. Entries
+    # using GREETING_TEMPLATE are left out; see RENDERED_GREETINGS.
+    rendered: Dict[str, Dict[str, bytes]] = {}
+    generation: int = 0
+
+    def match_exact(self, normalized_q: str) -> Optional[Dict]:
+        if self.exact_keys is not None:
+            key = exact_match_key(normalized_q)
+            pos = int(np.searchsorted(self.exact_keys, key))
+            if pos < len(self.exact_keys) and self.exact_keys[pos] == key:
+                return self.all_entries[int(self.exact_entry_ids[pos])]
+            return None
+        return self.exact_match_map.get(normalized_q)
+
+    def match_semantic_batch(self, query_embs):
+        """
+        Best (score, entry) for each query, from one matrix-matrix product
+        against the float16 vectors.
+        """
+        if self.vectors is None or not len(query_embs):
+            return [(-1, None)] * len(query_embs)
+
+        queries = normalize_rows(query_embs)
+        if queries.shape[1] != self.vectors.shape[1]:
+            return [(-1, None)] * len(query_embs)
+
+        best_scores, best_rows = best_matches_float16(self.vectors, queries)
+        return [(float(score), self.entries[int(row)]) for score, row in zip(best_scores, best_rows)]
+
+    def match_semantic(self, query_emb):
+        """Returns (best_score, best_entry) over the FAQ vectors."""
+        if self.vectors is None:
+            return -1, None
+
+        query = normalize_rows(query_emb)
+        if len(query) != self.vectors.shape[1]:
+            return -1, None
+
+        if FAQ_SCAN_MODE == "int8" and self.int8_vectors is not None:
+            candidates = top_candidates(scan_int8(self.int8_vectors, self.int8_scales, query), FAQ_RESCORE_TOP)
+        elif FAQ_SCAN_MODE == "binary" and self.binary_codes is not None:
+            distances = hamming_distances(self.binary_codes, binary_codes(query))
+            candidates = top_candidates(distances, FAQ_RESCORE_TOP, largest=False)
+        else:
+            scores = scan_float16(self.vectors, query)
+            best = int(np.argmax(scores))
+            return float(scores[best]), self.entries[best]
+
+        # Re-score the first-pass candidates against the float16 vectors
+        scores = self.vectors[candidates].astype(np.float32) @ query
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.entries[int(candidates[best])]
+
+
+def render_responses(entries: List[Dict]) -> Dict[str, Dict[str, bytes]]:
+    return {
+        entry["id"]: {source: render_faq_prefix(entry["answer"], source) for source in FAQ_SOURCE_TYPES}
+        for entry in entries
+        if entry["answer"] != GREETING_TEMPLATE
+    }
+
+
+class FAQIndex:
+    """
+    FAQ vectors and exact-match lookups for a single tenant namespace.
+    Each tenant is searched on its own, so a lookup only scans that
+    tenant's FAQs.
+    """
+    def __init__(self, namespace: str, faq_path: Path, collection_name: str):
+        self.namespace = namespace
+        self.faq_path = faq_path
+        self.collection_name = collection_name
+        self.last_used = time.monotonic()
+        self.snapshot = FAQSnapshot()
+
+        # Set when attached to a shared (memory-mapped) index
+        self._store: Optional[SharedIndexStore] = None
+        self._manifest_mtime = 0.0
+        self._last_refresh_check = 0.0
+
+    @property
+    def generation(self) -> int:
+        return self.snapshot.generation
+
+    async def load(self, force_rebuild: bool = False):
+        if not FAQ_SHARED_INDEX:
+            await self._build()
+            return
+
+        # Only one worker builds; the rest attach to what it published
+        store = SharedIndexStore(FAQ_SHARED_INDEX_DIR / (self.namespace or "@default"))
+        fingerprint = self._fingerprint()
+        async with store.lock():
+            manifest = store.read_manifest()
+            if force_rebuild or not manifest or manifest["fingerprint"] != fingerprint:
+                await self._build()
+                arrays, payload = self._shared_snapshot()
+                manifest = store.publish(arrays, payload, fingerprint, namespace=self.namespace, scan_mode=FAQ_SCAN_MODE)
+                print(f"Published shared FAQ index generation {manifest['generation']} for namespace '{self.namespace}'.")
+        self._attach(store, manifest)
+        self.touch()
+
+    def _fingerprint(self) -> str:
+        """Changes whenever a rebuilt index would differ from the published one."""
+        digest = hashlib.sha256()
+        if self.faq_path.exists():
+            digest.update(self.faq_path.read_bytes())
+        digest.update(json.dumps(generate_greeting_faqs(), sort_keys=True).encode())
+        digest.update(f"{FAQ_SCAN_MODE}|{ai_service.embedding_model_name}".encode())
+        return digest.hexdigest()
+
+    def _shared_snapshot(self):
+        """Flattens the built snapshot into arrays plus a JSON list of entries."""
+        snapshot = self.snapshot
+        positions = {id(entry): i for i, entry in enumerate(snapshot.all_entries)}
+
+        exact = sorted(
+            (exact_match_key(question), positions[id(entry)])
+            for question, entry in snapshot.exact_match_map.items()
+        )
+        arrays = {
+            "exact_keys": np.array([key for key, _ in exact], dtype=np.uint64),
+            "exact_entry_ids": np.array([pos for _, pos in exact], dtype=np.int32),
+        }
+        if snapshot.vectors is not None:
+            arrays["vector_entry_ids"] = np.array([positions[id(entry)] for entry in snapshot.entries], dtype=np.int32)
+            arrays["vectors"] = snapshot.vectors
+            for name in ("int8_vectors", "int8_scales", "binary_codes"):
+                if getattr(snapshot, name) is not None:
+                    arrays[name] = getattr(snapshot, name)
+        return arrays, snapshot.all_entries
+
+    def _attach(self, store: SharedIndexStore, manifest: Dict):
+        arrays, all_entries = store.attach(manifest)
+        vector_entry_ids = arrays.get("vector_entry_ids")
+        # The private copy built in this process (if any) is dropped here
+        self.snapshot = FAQSnapshot(
+            entries=[all_entries[int(i)] for i in vector_entry_ids] if vector_entry_ids is not None else [],
+            vectors=arrays.get("vectors"),
+            int8_vectors=arrays.get("int8_vectors"),
+            int8_scales=arrays.get("int8_scales"),
+            binary_codes=arrays.get("binary_codes"),
+            all_entries=all_entries,
+            exact_keys=arrays["exact_keys"],
+            exact_entry_ids=arrays["exact_entry_ids"],
+            rendered=render_responses(all_entries),
+            generation=manifest["generation"]
+        )
+        self._store = store
+        self._manifest_mtime = store.manifest_mtime()
+
+    def maybe_refresh(self):
+        """Re-attaches if another process published a newer generation."""
+        if self._store is None:
+            return
+        now = time.monotonic()
+        if now - self._last_refresh_check < FAQ_SHARED_REFRESH_SECONDS:
+            return
+        self._last_refresh_check = now
+
+        mtime = self._store.manifest_mtime()
+        if mtime == self._manifest_mtime:
+            return
+        manifest = self._store.read_manifest()
+        if manifest and manifest["generation"] != self.generation:
+            self._attach(self._store, manifest)
+            print(f"Attached shared FAQ index generation {self.generation} for namespace '{self.namespace}'.")
+        else:
+            self._manifest_mtime = mtime
+
+    async def _build(self):
         # 1. Load FAQs from disk
-        self._load_json_config()
-        
-        if not self.faqs:
-            print("WARNING: No FAQs loaded from JSON.") 
-            
+        faqs, exact_match_map = self._load_json_config()
+
+        if not faqs:
+            print(f"WARNING: No FAQs loaded from JSON for namespace '{self.namespace}'.")
+
         # 2. Generate Greeting FAQs (Dynamic)
-        greeting_faqs = self._generate_greeting_faqs()
-        print(f"Generated {len(greeting_faqs)} greeting variations.")
-        
-        # 3. Merge Lists
-        all_items = self.faqs + greeting_faqs
-        
-        # 4. Compute/Load Embeddings
-        print(f"Processing embeddings for {len(all_items)} total items (Persistent Mode)...")
-        await self._sync_embeddings(all_items)
-        
-        print(f"FAQ Service Ready: {len(self.faq_embeddings)} vectors loaded in memory.")
+        greeting_faqs = generate_greeting_faqs()
+        for entry in greeting_faqs:
+            exact_match_map[normalize_question(entry["question"])] = entry
+
+        # 3. Compute/Load Embeddings. Greetings are identical for every
+        # tenant, so their vectors are shared through the default collection.
+        print(f"Processing embeddings for {len(faqs) + len(greeting_faqs)} total items (Persistent Mode)...")
+        rows = []
+        await self._sync_embeddings(faqs, self.collection_name, rows)
+        await self._sync_embeddings(greeting_faqs, DEFAULT_COLLECTION, rows)
+
+        # 4. Publish everything at once
+        all_entries = faqs + greeting_faqs
+        self.snapshot = FAQSnapshot(
+            **self._build_matrices(rows),
+            all_entries=all_entries,
+            exact_match_map=exact_match_map,
+            rendered=render_responses(all_entries)
+        )
+        self.touch()
+
+    def _build_matrices(self, rows) -> Dict:
+        if rows:
+            # Guard against vectors from a different embedding model
+            dim = len(rows[0][0])
+            rows = [row for row in rows if len(row[0]) == dim]
+
+        matrices = {"entries": [entry for _, entry in rows]}
+        if not rows:
+            return matrices
+
+        vectors = matrices["vectors"] = np.stack([vector for vector, _ in rows]).astype(np.float16)
+        if FAQ_SCAN_MODE == "int8":
+            matrices["int8_vectors"], matrices["int8_scales"] = quantize_int8(vectors)
+        elif FAQ_SCAN_MODE == "binary":
+            matrices["binary_codes"] = binary_codes(vectors)
+        return matrices
+
+    def __len__(self):
+        return len(self.snapshot.entries)
+
+    def memory_bytes(self) -> int:
+        snapshot = self.snapshot
+        arrays = (snapshot.vectors, snapshot.int8_vectors, snapshot.int8_scales, snapshot.binary_codes)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def touch(self):
+        self.last_used = time.monotonic()
 
     def _load_json_config(self):
+        """Returns (faqs, exact match map)."""
         try:
-            path = Path(__file__).parent.parent / "data" / "faqs.json"
-            if not path.exists():
-                # Fallback check
-                path = Path(__file__).parent.parent / "data" / "faqs_generated.json"
-                
+            path = self.faq_path
             if not path.exists():
-                print(f"ERROR: No FAQ JSON found.")
-                return
+                print(f"ERROR: No FAQ JSON found at {path}.")
+                return [], {}
 
             with open(path, "r", encoding="utf-8") as f:
-                self.faqs = json.load(f)
-            
+                faqs = json.load(f)
+
             # Build exact match map for JSON items
-            self.exact_match_map = {}
-            for entry in self.faqs:
+            exact_match_map = {}
+            for entry in faqs:
                 questions = [entry["question"]] + entry.get("variations", [])
                 for q in questions:
-                    normalized = self._normalize(q)
-                    self.exact_match_map[normalized] = entry
-                    
+                    normalized = normalize_question(q)
+                    exact_match_map[normalized] = entry
+            return faqs, exact_match_map
+
         except Exception as e:
             print(f"Error loading FAQs: {e}")
-            self.faqs = []
-
-    def _generate_greeting_faqs(self) -> List[Dict]:
-        """Generates 200+ greeting variations."""
-        base_greetings = [
-            "hi", "hello", "hey", "good morning", "good afternoon", "good evening", 
-            "namaste", "yo", "hiya", "howdy", "greetings", "what's up", "sup", "heya",
-            "hola", "bonjour", "hallo", "gday", "what is up", "hey there", "hello there"
-        ]
-        
-        modifiers = ["", "!", ".", " there", " bot", " ai", " assistant", " friend", " buddy", " mate", " sir", " maam"]
-        typos = ["hy", "hlo", "heyy", "heyyy", "hii", "hiii", "hlw", "hie"]
-        
-        greetings = []
-        
-        # 1. Combine base + modifiers
-        for g in base_greetings:
-            for m in modifiers:
-                txt = f"{g}{m}".strip()
-                greetings.append(txt)
-                
-        # 2. Add Typos
-        greetings.extend(typos)
-        
-        # 3. Construct FAQ Entries
-        faq_entries = []
-        for i, g_text in enumerate(greetings, 1):
-            entry = {
-                "id": f"greeting_gen_{i}",
-                "question": g_text,
-                "variations": [],
-                "answer": "{{TIME_AWARE_GREETING}}",
-                "type": "greeting"
-            }
-            faq_entries.append(entry)
-            
-            # Add to exact match map
-            normalized = self._normalize(g_text)
-            self.exact_match_map[normalized] = entry
-            
-        return faq_entries
+            return [], {}
 
-    async def _sync_embeddings(self, items: List[Dict]):
+    async def _sync_embeddings(self, items: List[Dict], collection_name: str, rows: List):
         """
-        Iterates through items. 
-        Checks MongoDB for existing embedding (ID + Hash match).
-        If missing, generates and saves.
-        Populates self.faq_embeddings.
+        Loads stored embeddings for all items with one batched query
+        (ID + Hash match). Missing ones are generated and saved with a
+        single bulk upsert.
+        Appends (float16 vector, entry) pairs to rows.
         """
-        self.faq_embeddings = []
-        new_embeddings_count = 0
-        
+        # Create a deterministic content hash
+        hashes = {
+            entry["id"]: hashlib.sha256(entry["question"].encode()).hexdigest()
+            for entry in items
+        }
+
+        # 1. Check DB
+        existing = await mongo_db.find_in(
+            collection_name,
+            "faq_id",
+            list(hashes),
+            {"_id": 0, "faq_id": 1, "content_hash": 1, "embedding_f16": 1, "embedding": 1}
+        )
+        stored = {}
+        legacy_docs = []
+        for doc in existing:
+            key = (doc["faq_id"], doc["content_hash"])
+            if doc.get("embedding_f16"):
+                stored[key] = from_float16_blob(doc["embedding_f16"])
+            elif doc.get("embedding") and doc["content_hash"] == hashes[doc["faq_id"]] and key not in stored:
+                # Older documents hold a list of floats; rewrite them as blobs.
+                # Ones for a question's previous text are stale and left alone.
+                blob = to_float16_blob(doc["embedding"])
+                stored[key] = from_float16_blob(blob)
+                legacy_docs.append({
+                    "faq_id": doc["faq_id"],
+                    "content_hash": doc["content_hash"],
+                    "embedding_f16": blob,
+                    "dim": len(doc["embedding"])
+                })
+
+        new_docs = []
         for entry in items:
-            # Create a deterministic content hash
-            content_str = entry["question"]
-            content_hash = hashlib.sha256(content_str.encode()).hexdigest()
-            
-            # 1. Check DB
-            existing = await mongo_db.get_document(
-                self.collection_name, 
-                {"faq_id": entry["id"], "content_hash": content_hash}
-            )
-            
-            emb_vector = None
-            
-            if existing:
-                # HIT: Load from DB
-                emb_vector = existing["embedding"]
-            else:
+            content_hash = hashes[entry["id"]]
+            # HIT: Load from DB
+            emb_vector = stored.get((entry["id"], content_hash))
+
+            if emb_vector is None:
                 # MISS: Generate
                 try:
-                    # Rate limit safety (simple sleep if processing huge batch)
-                    # For 200 items, Gemini is fast enough.
-                    emb_vector = ai_service.get_embeddings(entry["question"])
-                    new_embeddings_count += 1
-                    
-                    # Save to DB
-                    await mongo_db.insert_document(self.collection_name, {
-                        "faq_id": entry["id"],
-                        "content_hash": content_hash,
-                        "embedding": emb_vector,
-                        "text": entry["question"],
-                        "updated_at": datetime.utcnow()
-                    })
+                    embedding = ai_service.get_embeddings(entry["question"])
                 except Exception as e:
                     print(f"Failed to embed {entry['id']}: {e}")
                     continue
-            
+
+                blob = to_float16_blob(embedding)
+                emb_vector = from_float16_blob(blob)
+                new_docs.append({
+                    "faq_id": entry["id"],
+                    "content_hash": content_hash,
+                    "embedding_f16": blob,
+                    "dim": len(embedding),
+                    "text": entry["question"],
+                    "updated_at": datetime.utcnow()
+                })
+
             # Add to in-memory index
-            if emb_vector:
-                self.faq_embeddings.append((emb_vector, entry))
-                
-        if new_embeddings_count > 0:
-            print(f"Generated {new_embeddings_count} NEW embeddings. Loaded rest from DB.")
+            if len(emb_vector):
+                rows.append((emb_vector, entry))
+
+        # 2. Save to DB. Upserting new vectors on faq_id replaces the stale
+        # vector when a question's text changes. Older data can hold several
+        # documents per faq_id, so migrated ones are matched on
+        # (faq_id, content_hash) to rewrite exactly the document they came from.
+        try:
+            if new_docs:
+                await mongo_db.bulk_upsert(collection_name, new_docs, ["faq_id"], unset_fields=["embedding"])
+            if legacy_docs:
+                await mongo_db.bulk_upsert(collection_name, legacy_docs, ["faq_id", "content_hash"], unset_fields=["embedding"])
+        except Exception as e:
+            print(f"Failed to save embeddings to '{collection_name}': {e}")
+        if new_docs:
+            print(f"Generated {len(new_docs)} NEW embeddings in '{collection_name}'. Loaded rest from DB.")
         else:
-            print("All embeddings loaded from DB (Zero cost).")
+            print(f"All embeddings in '{collection_name}' loaded from DB (Zero cost).")
+
+    # Each lookup reads self.snapshot once; see FAQSnapshot
+    def match_exact(self, normalized_q: str) -> Optional[Dict]:
+        return self.snapshot.match_exact(normalized_q)
+
+    def match_semantic_batch(self, query_embs):
+        return self.snapshot.match_semantic_batch(query_embs)
+
+    def match_semantic(self, query_emb):
+        return self.snapshot.match_semantic(query_emb)
+
+
+class FAQService:
+    def __init__(self):
+        self.similarity_threshold = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", "0.75"))
+        self.collection_name = DEFAULT_COLLECTION
+        mongo_db.register_indexes(DEFAULT_COLLECTION, FAQ_STORE_INDEXES)
+
+        # Tenant indexes are loaded on first use and dropped after sitting
+        # idle, so memory follows active tenants rather than all tenants.
+        self.tenant_idle_seconds = int(os.getenv("FAQ_TENANT_IDLE_SECONDS", "900"))
+        self.default_index = FAQIndex(DEFAULT_NAMESPACE, self._default_faq_path(), DEFAULT_COLLECTION)
+        self.tenant_indexes: Dict[str, FAQIndex] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._last_eviction = time.monotonic()
+
+    async def initialize(self):
+        print("Initializing FAQ Service...")
+        await self.default_index.load()
+        index = self.default_index
+        print(f"FAQ Service Ready: {len(index)} vectors loaded in memory "
+              f"({index.memory_bytes() / 1024:.0f} KB, scan mode: {FAQ_SCAN_MODE}).")
+
+    def _default_faq_path(self) -> Path:
+        path = DATA_DIR / "faqs.json"
+        if not path.exists():
+            # Fallback check
+            path = DATA_DIR / "faqs_generated.json"
+        return path
+
+    def _tenant_faq_path(self, namespace: str) -> Path:
+        return DATA_DIR / TENANT_DATA_DIR / namespace / "faqs.json"
+
+    async def get_index(self, namespace: str = DEFAULT_NAMESPACE) -> FAQIndex:
+        """
+        Returns the FAQ index for a tenant, loading it lazily.
+        Tenants without their own FAQ file share the default index.
+        """
+        self._evict_idle()
+
+        if namespace == DEFAULT_NAMESPACE:
+            self.default_index.maybe_refresh()
+            return self.default_index
+
+        index = self.tenant_indexes.get(namespace)
+        if index:
+            index.maybe_refresh()
+            index.touch()
+            return index
+
+        faq_path = self._tenant_faq_path(namespace)
+        if not faq_path.exists():
+            return self.default_index
+
+        # Concurrent first requests for a tenant share one load. Shielded so
+        # a cancelled request does not cancel the load for the others.
+        task = self._loading.get(namespace)
+        if task is None:
+            task = asyncio.create_task(self._load_tenant(namespace, faq_path))
+            self._loading[namespace] = task
+        return await asyncio.shield(task)
+
+    async def build_index(self, namespace: str = DEFAULT_NAMESPACE, force_rebuild: bool = False) -> FAQIndex:
+        """
+        Loads (or with force_rebuild, rebuilds) a namespace's index. In shared
+        mode this publishes a new generation that running workers pick up.
+        """
+        if namespace == DEFAULT_NAMESPACE:
+            await self.default_index.load(force_rebuild=force_rebuild)
+            return self.default_index
+        return await self._load_tenant(namespace, self._tenant_faq_path(namespace), force_rebuild)
+
+    async def _load_tenant(self, namespace: str, faq_path: Path, force_rebuild: bool = False) -> FAQIndex:
+        try:
+            print(f"Loading FAQ index for namespace '{namespace}'...")
+            collection_name = f"{DEFAULT_COLLECTION}__{namespace}"
+            mongo_db.register_indexes(collection_name, FAQ_STORE_INDEXES)
+            await mongo_db.ensure_indexes(collection_name)
+            index = FAQIndex(namespace, faq_path, collection_name)
+            await index.load(force_rebuild=force_rebuild)
+            self.tenant_indexes[namespace] = index
+            return index
+        finally:
+            self._loading.pop(namespace, None)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        # Sweeping is cheap, but there is no need to do it on every request
+        if now - self._last_eviction < 60:
+            return
+        self._last_eviction = now
+
+        for namespace, index in list(self.tenant_indexes.items()):
+            if now - index.last_used > self.tenant_idle_seconds:
+                del self.tenant_indexes[namespace]
+                print(f"Evicted idle FAQ index for namespace '{namespace}'.")
 
     def _normalize(self, text: str) -> str:
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
-        return text.strip()
-
-    def _cosine_similarity(self, vec1, vec2):
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = math.sqrt(sum(a * a for a in vec1))
-        magnitude2 = math.sqrt(sum(b * b for b in vec2))
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-        return dot_product / (magnitude1 * magnitude2)
-
-    def _get_time_aware_greeting(self) -> str:
-        """Returns Good Morning/Afternoon/Evening based on server time."""
-        hour = datetime.now().hour
-        if 5 <= hour < 12:
-            return "Good morning! How can I help you today?"
-        elif 12 <= hour < 17:
-            return "Good afternoon! How can I help you today?"
+        return normalize_question(text)
+
+    def _build_result(self, snapshot: FAQSnapshot, entry: Dict, source: str, score: Optional[float] = None) -> Dict:
+        # The rendered bytes come from the snapshot the entry was matched in
+        variants = snapshot.rendered.get(entry["id"])
+        if variants is None:
+            # Time-aware greeting
+            bucket = greeting_bucket()
+            answer, variants = GREETING_ANSWERS[bucket], RENDERED_GREETINGS[bucket]
         else:
-            return "Good evening! How can I help you today?"
+            answer = entry["answer"]
+
+        result = {"answer": answer, "source": source, "rendered": variants[source]}
+        if score is not None:
+            result["confidence"] = round(score, 4)
+        return result
 
-    async def get_answer(self, query: str) -> Optional[Dict]:
-        normalized_q = self._normalize(query)
-        
+    def render(self, faq_result: Dict, time_seconds: float) -> bytes:
+        """The serialized /query response for an FAQ hit."""
+        return faq_result["rendered"] + b"%.3f" % time_seconds + FAQ_RESPONSE_SUFFIX
+
+    def response(self, faq_result: Dict, time_seconds: float) -> Dict:
+        """Shapes an FAQ hit like a /query response, for callers that need a dict."""
+        return {
+            "answer": faq_result["answer"],
+            "sources": [{"text": "FAQ Database", "metadata": {"source": "faq", "type": faq_result["source"]}}],
+            "metrics": {
+                "time_seconds": round(time_seconds, 3),
+                "tokens": 0,
+                "cost_estimate": 0.0
+            }
+        }
+
+    async def match_exact(self, query: str, namespace: str = DEFAULT_NAMESPACE) -> Optional[Dict]:
+        """Exact match on the normalized question. Needs no embedding."""
+        with trace_stage("faq_exact"):
+            snapshot = (await self.get_index(namespace)).snapshot
+            match = snapshot.match_exact(self._normalize(query))
+        if not match:
+            return None
+
+        trace = get_current_trace()
+        if trace:
+            trace.faq = {"decision": "exact_hit", "faq_id": match["id"]}
+        return self._build_result(snapshot, match, "faq_exact")
+
+    async def match_semantic(self, query_emb, namespace: str = DEFAULT_NAMESPACE) -> Optional[Dict]:
+        """Semantic match against a precomputed query embedding."""
+        with trace_stage("faq_semantic"):
+            snapshot = (await self.get_index(namespace)).snapshot
+            best_score, best_entry = await asyncio.to_thread(snapshot.match_semantic, query_emb)
+
+        hit = best_entry is not None and best_score >= self.similarity_threshold
+        trace = get_current_trace()
+        if trace:
+            trace.faq = {
+                "decision": "semantic_hit" if hit else "miss",
+                "score": round(float(best_score), 4),
+                "threshold": self.similarity_threshold,
+                "faq_id": best_entry["id"] if best_entry else None
+            }
+
+        if hit:
+            return self._build_result(snapshot, best_entry, "faq_semantic", best_score)
+        return None
+
+    async def match_semantic_batch(self, query_embs, namespace: str = DEFAULT_NAMESPACE) -> List[Optional[Dict]]:
+        """Semantic match for many precomputed query embeddings at once."""
+        snapshot = (await self.get_index(namespace)).snapshot
+        matches = await asyncio.to_thread(snapshot.match_semantic_batch, query_embs)
+        return [
+            self._build_result(snapshot, entry, "faq_semantic", score)
+            if entry is not None and score >= self.similarity_threshold else None
+            for score, entry in matches
+        ]
+
+    async def get_answer(self, query: str, namespace: str = DEFAULT_NAMESPACE) -> Optional[Dict]:
         # 1. Exact Match
-        if normalized_q in self.exact_match_map:
-            match = self.exact_match_map[normalized_q]
-            answer = match["answer"]
-            
-            if answer == "{{TIME_AWARE_GREETING}}":
-                answer = self._get_time_aware_greeting()
-                
-            print(f"FAQ HIT (Exact): {query}")
-            return {"answer": answer, "source": "faq_exact"}
+        result = await self.match_exact(query, namespace)
+        if result:
+            return result
 
         # 2. Semantic Match
         try:
-            query_emb = ai_service.get_query_embedding(normalized_q)
-            best_score = -1
-            best_entry = None
-            
-            for doc_emb, entry in self.faq_embeddings:
-                score = self._cosine_similarity(query_emb, doc_emb)
-                if score > best_score:
-                    best_score = score
-                    best_entry = entry
-            
-            print(f"FAQ Best Score: {best_score} for '{query}'")
-            
-            if best_score >= self.similarity_threshold:
-                answer = best_entry["answer"]
-                if answer == "{{TIME_AWARE_GREETING}}":
-                    answer = self._get_time_aware_greeting()
-                    
-                print(f"FAQ HIT (Semantic): {query} -> {best_entry['question']}")
-                return {
-                    "answer": answer,
-                    "source": "faq_semantic",
-                    "confidence": round(best_score, 4)
-                }
-                
+            with trace_stage("faq_embed"):
+                query_emb = await asyncio.to_thread(ai_service.get_query_embedding, self._normalize(query))
+            return await self.match_semantic(query_emb, namespace)
         except Exception as e:
             print(f"FAQ Semantic Check Failed: {e}")
             
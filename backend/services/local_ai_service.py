@@ -0,0 +1,86 @@
+import re
+import hashlib
+import math
+from functools import lru_cache
+from typing import List
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+@lru_cache(maxsize=65536)
+def _feature_slot(feature: str, dimension: int):
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dimension, (1.0 if value >> 63 else -1.0)
+
+
+class RerankResult:
+    def __init__(self, index: int, relevance_score: float):
+        self.index = index
+        self.relevance_score = relevance_score
+
+
+class LocalAIService:
+    """
+    Offline stand-in for AIService with the same interface. Embeddings are
+    hashed word unigrams+bigrams, reranking is lexical overlap and the
+    "answer" is the first sentences of the context. It is deterministic, free
+    and fast, so it is used for benchmarks and evaluation runs. It is not
+    meant to match Gemini/Cohere quality.
+    """
+    def __init__(self, dimension: int = 768):
+        self.dimension = dimension
+        self.generation_model_name = "local-extractive"
+        self.embedding_model_name = "local-hashing"
+
+    def _tokens(self, text: str) -> List[str]:
+        return _WORD.findall(text.lower())
+
+    def _embed(self, text: str):
+        vector = [0.0] * self.dimension
+        words = self._tokens(text)
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            slot, sign = _feature_slot(feature, self.dimension)
+            vector[slot] += sign
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm:
+            vector = [v / norm for v in vector]
+        return vector
+
+    def get_embeddings(self, text: str):
+        return self._embed(text)
+
+    def get_query_embedding(self, query: str):
+        return self._embed(query)
+
+    def get_query_embeddings(self, queries: list, batch_size: int = 100):
+        return [self._embed(query) for query in queries]
+
+    def rerank(self, query: str, documents: list, top_n: int = 5):
+        if not documents:
+            return []
+        query_words = set(self._tokens(query))
+        scored = []
+        for i, doc in enumerate(documents):
+            doc_words = set(self._tokens(doc))
+            overlap = len(query_words & doc_words)
+            score = overlap / math.sqrt(len(doc_words) or 1)
+            scored.append(RerankResult(i, score))
+        scored.sort(key=lambda r: r.relevance_score, reverse=True)
+        return scored[:top_n]
+
+    def generate_answer(self, query: str, context: str):
+        # Skip the "Source [n] (From: ...):" header of the first block
+        body = context.split(":\n", 1)[-1].strip()
+        if not body:
+            return {
+                "answer": "I don’t have enough information from your data to answer that right now.",
+                "tokens": 0,
+                "prompt_tokens": 0
+            }
+        answer = " ".join(_SENTENCE_END.split(body)[:2])
+        # ~4 characters per token
+        prompt_tokens = (len(query) + len(context)) // 4
+        return {"answer": answer, "tokens": prompt_tokens + len(answer) // 4, "prompt_tokens": prompt_tokens}
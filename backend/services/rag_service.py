@@ -1,43 +1,92 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 try:
     # When running from project root (package mode)
     from backend.services.ai_service import ai_service
+    from backend.services.chunking import ChunkerRegistry
+    from backend.services.faq_service import faq_service
     from backend.utils.vector_db import vector_db
     from backend.utils.database import mongo_db
+    from backend.utils.tenancy import DEFAULT_NAMESPACE
+    from backend.utils.lru_cache import LRUCache
+    from backend.utils.tracing import get_current_trace, trace_stage
 except ModuleNotFoundError:
     # When running from inside backend/ (module mode)
     from services.ai_service import ai_service
+    from services.chunking import ChunkerRegistry
+    from services.faq_service import faq_service
     from utils.vector_db import vector_db
     from utils.database import mongo_db
+    from utils.tenancy import DEFAULT_NAMESPACE
+    from utils.lru_cache import LRUCache
+    from utils.tracing import get_current_trace, trace_stage
+from pymongo import IndexModel
+import asyncio
+import os
 import uuid
 import time
 
+CHUNKS_COLLECTION = "chunks"
+GENERATION_COST_PER_TOKEN = 0.000000125 # Rough Gemini 1.5 Flash cost
+
 class RAGService:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=150,
-            length_function=len,
-            is_separator_regex=False,
-        )
-
-    async def ingest_text(self, text: str, metadata: dict):
+        # Chunking strategy/size/overlap is configurable per source
+        self.chunkers = ChunkerRegistry()
+        # Keyed by (chunk_id, rev). Vectors carry their document's revision,
+        # so after an update every worker misses and refetches, not just the
+        # one that handled it.
+        self.chunk_cache = LRUCache(int(os.getenv("CHUNK_CACHE_SIZE", "2048")))
+        # Candidates fetched from the vector DB, and how many survive reranking
+        self.top_k = int(os.getenv("RAG_TOP_K", "10"))
+        self.top_n = int(os.getenv("RAG_TOP_N", "5"))
+
+        # Chunk text lives in Mongo and is looked up by the vector id, or by
+        # document when a document's chunks are managed as a group.
+        mongo_db.register_indexes("documents", [IndexModel("doc_id", unique=True)])
+        mongo_db.register_indexes(CHUNKS_COLLECTION, [
+            IndexModel("chunk_id", unique=True),
+            IndexModel([("doc_id", 1), ("chunk_index", 1)])
+        ])
+
+    async def ingest_text(self, text: str, metadata: dict, namespace: str = DEFAULT_NAMESPACE):
         # 1. Chunking
-        chunks = self.text_splitter.split_text(text)
+        chunks = self.chunkers.split_text(text, metadata.get("source"))
         
         doc_id = str(uuid.uuid4())
         metadata["doc_id"] = doc_id
         
-        # 2. Store in MongoDB
+        # 2. Store in MongoDB. The text is kept once, split into chunks, rather
+        # than as a full copy here plus a copy in every vector's metadata.
         mongo_doc = {
             "doc_id": doc_id,
-            "text": text,
             "metadata": metadata,
-            "chunk_count": len(chunks)
+            "namespace": namespace,
+            "chunk_count": len(chunks),
+            "rev": 0
         }
         await mongo_db.insert_document("documents", mongo_doc)
+
+        await mongo_db.insert_many(CHUNKS_COLLECTION, self._build_chunk_docs(doc_id, chunks, metadata, namespace))
         
-        # 3. Embedding & Store in Vector DB
+        # 3. Embedding & Store in Vector DB (vectors only carry ids)
+        self._embed_and_upsert(doc_id, chunks, namespace)
+        return doc_id
+
+    def _build_chunk_docs(self, doc_id: str, chunks: list, metadata: dict, namespace: str, rev: int = 0):
+        return [
+            {
+                "chunk_id": f"{doc_id}_{i}",
+                "doc_id": doc_id,
+                "chunk_index": i,
+                "rev": rev,
+                "namespace": namespace,
+                "text": chunk,
+                "source": metadata.get("source", "unknown"),
+                "title": metadata.get("title", "Untitled")
+            }
+            for i, chunk in enumerate(chunks)
+        ]
+
+    def _embed_and_upsert(self, doc_id: str, chunks: list, namespace: str, rev: int = 0):
         vectors = []
         for i, chunk in enumerate(chunks):
             embedding = ai_service.get_embeddings(chunk)
@@ -45,38 +94,175 @@ class RAGService:
                 "id": f"{doc_id}_{i}",
                 "values": embedding,
                 "metadata": {
-                    "text": chunk,
                     "doc_id": doc_id,
                     "chunk_index": i,
+                    "rev": rev
+                }
+            })
+            
+        vector_db.upsert_vectors(vectors, namespace=namespace)
+
+    def _invalidate_chunks(self, doc_id: str, chunk_count: int, rev: int):
+        # Only frees this worker's entries early; other workers stop hitting
+        # them because the revision in the vectors changes.
+        for i in range(chunk_count):
+            self.chunk_cache.pop((f"{doc_id}_{i}", rev))
+
+    async def delete_document(self, doc_id: str) -> bool:
+        """
+        Removes a document, its chunks and its vectors.
+        Returns False if the document does not exist.
+        """
+        doc = await mongo_db.get_document("documents", {"doc_id": doc_id})
+        if not doc:
+            return False
+
+        namespace = doc.get("namespace", DEFAULT_NAMESPACE)
+        chunk_count = doc.get("chunk_count", 0)
+
+        # Vector ids are {doc_id}_{i}, so the id range is known without a lookup
+        vector_db.delete_vectors([f"{doc_id}_{i}" for i in range(chunk_count)], namespace=namespace)
+        await mongo_db.delete_many(CHUNKS_COLLECTION, {"doc_id": doc_id})
+        await mongo_db.delete_document("documents", {"doc_id": doc_id})
+        self._invalidate_chunks(doc_id, chunk_count, doc.get("rev", 0))
+        return True
+
+    async def update_document(self, doc_id: str, text: str, metadata: dict):
+        """
+        Re-chunks a document in place. Chunks and vectors with the same index
+        are overwritten, and any left past the new chunk count are deleted.
+        Returns None if the document does not exist.
+        """
+        doc = await mongo_db.get_document("documents", {"doc_id": doc_id})
+        if not doc:
+            return None
+
+        namespace = doc.get("namespace", DEFAULT_NAMESPACE)
+        old_count = doc.get("chunk_count", 0)
+        old_rev = doc.get("rev", 0)
+        rev = old_rev + 1
+        metadata = {**doc.get("metadata", {}), **metadata, "doc_id": doc_id}
+
+        # 1. Chunking
+        chunks = self.chunkers.split_text(text, metadata.get("source"))
+        new_count = len(chunks)
+
+        # 2. Overwrite chunks, then vectors 0..new_count-1. Chunks go first, so
+        # a vector carrying the new revision never resolves to old text.
+        await mongo_db.bulk_upsert(CHUNKS_COLLECTION, self._build_chunk_docs(doc_id, chunks, metadata, namespace, rev), ["chunk_id"])
+        self._embed_and_upsert(doc_id, chunks, namespace, rev)
+
+        # 3. Drop anything past the new end of the document
+        if old_count > new_count:
+            vector_db.delete_vectors([f"{doc_id}_{i}" for i in range(new_count, old_count)], namespace=namespace)
+            await mongo_db.delete_many(CHUNKS_COLLECTION, {"doc_id": doc_id, "chunk_index": {"$gte": new_count}})
+
+        # Documents ingested before the chunk store also carry the full text
+        await mongo_db.update_document("documents", {"doc_id": doc_id}, {
+            "$set": {"metadata": metadata, "chunk_count": new_count, "rev": rev},
+            "$unset": {"text": ""}
+        })
+        self._invalidate_chunks(doc_id, old_count, old_rev)
+        return {"doc_id": doc_id, "chunk_count": new_count}
+
+    async def _hydrate_chunks(self, matches):
+        """
+        Resolves vector matches to chunk text. Hot chunks come from the LRU,
+        the rest from a single batched Mongo fetch.
+        """
+        found = {}
+        missing = []
+        for match in matches:
+            metadata = match.metadata or {}
+            if "text" in metadata:
+                # Vectors ingested before the chunk store still carry their text
+                found[match.id] = {
+                    "text": metadata["text"],
+                    "doc_id": metadata.get("doc_id"),
+                    "chunk_index": metadata.get("chunk_index"),
                     "source": metadata.get("source", "unknown"),
                     "title": metadata.get("title", "Untitled")
                 }
+                continue
+            cached = self.chunk_cache.get((match.id, metadata.get("rev", 0)))
+            if cached:
+                found[match.id] = cached
+            else:
+                missing.append(match.id)
+
+        if missing:
+            rows = await mongo_db.find_in(
+                CHUNKS_COLLECTION,
+                "chunk_id",
+                missing,
+                {"_id": 0, "chunk_id": 1, "rev": 1, "doc_id": 1, "chunk_index": 1, "text": 1, "source": 1, "title": 1}
+            )
+            for row in rows:
+                chunk_id = row.pop("chunk_id")
+                # Cached under the revision the text belongs to, which may be
+                # newer than the vector's while an update is in flight
+                self.chunk_cache.put((chunk_id, row.pop("rev", 0)), row)
+                found[chunk_id] = row
+
+        chunks = []
+        for match in matches:
+            row = found.get(match.id)
+            if not row:
+                # Vector without a stored chunk, e.g. mid-ingest; skip it
+                continue
+            chunks.append({
+                "text": row["text"],
+                "metadata": {
+                    "doc_id": row.get("doc_id"),
+                    "chunk_index": row.get("chunk_index"),
+                    "source": row.get("source", "unknown"),
+                    "title": row.get("title", "Untitled")
+                },
+                "score": match.score
             })
-            
-        vector_db.upsert_vectors(vectors)
-        return doc_id
+        return chunks
 
-    async def query(self, query_text: str):
-        start_time = time.time()
-        
+    async def embed_query(self, query_text: str):
+        # The SDK call is blocking; keep it off the event loop
+        with trace_stage("embed"):
+            return await asyncio.to_thread(ai_service.get_query_embedding, query_text)
+
+    async def retrieve(self, query_text: str, namespace: str = DEFAULT_NAMESPACE, query_embedding=None):
+        """
+        Embedding, vector search, hydration and reranking: everything up to
+        (but not including) generation. Accepts a precomputed query
+        embedding so it can share one with the FAQ layer.
+        """
         # 1. Embed Query
-        query_embedding = ai_service.get_query_embedding(query_text)
+        if query_embedding is None:
+            query_embedding = await self.embed_query(query_text)
         
         # 2. Retrieval (Top-K)
-        retrieval_results = vector_db.query_vectors(query_embedding, top_k=10)
+        # Only this tenant's namespace is searched, so latency tracks the
+        # tenant's corpus size rather than the whole index.
+        with trace_stage("vector_search"):
+            retrieval_results = await asyncio.to_thread(
+                vector_db.query_vectors, query_embedding, top_k=self.top_k, namespace=namespace
+            )
         
-        initial_chunks = [
-            {
-                "text": match.metadata["text"],
-                "metadata": match.metadata,
-                "score": match.score
-            }
-            for match in retrieval_results.matches
-        ]
+        with trace_stage("hydrate"):
+            initial_chunks = await self._hydrate_chunks(retrieval_results.matches)
         
         # 3. Reranking
         docs_to_rerank = [c["text"] for c in initial_chunks]
-        reranked_results = ai_service.rerank(query_text, docs_to_rerank, top_n=5)
+        with trace_stage("rerank"):
+            reranked_results = await asyncio.to_thread(ai_service.rerank, query_text, docs_to_rerank, self.top_n)
+
+        trace = get_current_trace()
+        if trace:
+            trace.retrieval = [{"id": m.id, "score": round(float(m.score), 4)} for m in retrieval_results.matches]
+            trace.rerank = [
+                {
+                    "id": f"{initial_chunks[r.index]['metadata']['doc_id']}_{initial_chunks[r.index]['metadata']['chunk_index']}",
+                    "score": round(float(r.relevance_score), 4)
+                }
+                for r in reranked_results
+            ]
         
         top_chunks = []
         context_parts = []
@@ -87,21 +273,102 @@ class RAGService:
             title = chunk_data['metadata'].get('title', 'Document')
             context_parts.append(f"Source [{i+1}] (From: {title}):\n{chunk_data['text']}")
             
-        context = "\n\n".join(context_parts)
-        
+        return {
+            "sources": top_chunks,
+            "context": "\n\n".join(context_parts)
+        }
+
+    async def generate(self, query_text: str, retrieval: dict, start_time: float):
         # 4. Generation
-        gen_result = ai_service.generate_answer(query_text, context)
+        with trace_stage("generate"):
+            gen_result = await asyncio.to_thread(ai_service.generate_answer, query_text, retrieval["context"])
+
+        trace = get_current_trace()
+        if trace:
+            trace.prompt_tokens = gen_result.get("prompt_tokens")
+            trace.total_tokens = gen_result["tokens"]
         
         end_time = time.time()
         
         return {
             "answer": gen_result["answer"],
-            "sources": top_chunks,
+            "sources": retrieval["sources"],
             "metrics": {
                 "time_seconds": round(end_time - start_time, 3),
                 "tokens": gen_result["tokens"],
-                "cost_estimate": round(gen_result["tokens"] * 0.000000125, 6) # Rough Gemini 1.5 Flash cost
+                "cost_estimate": round(gen_result["tokens"] * GENERATION_COST_PER_TOKEN, 6)
             }
         }
 
+    async def query(self, query_text: str, namespace: str = DEFAULT_NAMESPACE):
+        start_time = time.time()
+        retrieval = await self.retrieve(query_text, namespace)
+        return await self.generate(query_text, retrieval, start_time)
+
+    async def query_batch(self, queries: list, namespace: str = DEFAULT_NAMESPACE, concurrency: int = 8):
+        """
+        Answers many queries. Results are yielded as they complete (not in
+        input order), each tagged with its input index.
+
+        - FAQ exact matches are resolved up front.
+        - The remaining queries are embedded in batched API calls and
+          FAQ-matched with one matrix-matrix product.
+        - FAQ misses run retrieval + generation with at most `concurrency`
+          queries in flight.
+        """
+        # Reported times are per query: its own exact-match check, plus the
+        # batched embedding and FAQ match it shared with the rest of the batch
+
+        # 1. Exact FAQ matches need no embedding
+        pending = {} # index -> seconds spent so far
+        for i, query_text in enumerate(queries):
+            start_time = time.time()
+            faq_result = await faq_service.match_exact(query_text, namespace)
+            elapsed = time.time() - start_time
+            if faq_result:
+                yield {"index": i, "query": query_text, **faq_service.response(faq_result, elapsed)}
+            else:
+                pending[i] = elapsed
+        if not pending:
+            return
+
+        # 2. Batched embeddings, shared by the FAQ and RAG layers
+        start_time = time.time()
+        with trace_stage("embed_batch"):
+            embeddings = await asyncio.to_thread(ai_service.get_query_embeddings, [queries[i] for i in pending])
+
+        # 3. FAQ semantic match for all of them at once
+        faq_results = await faq_service.match_semantic_batch(embeddings, namespace)
+        shared_seconds = time.time() - start_time
+        misses = []
+        for i, embedding, faq_result in zip(pending, embeddings, faq_results):
+            if faq_result:
+                yield {"index": i, "query": queries[i], **faq_service.response(faq_result, pending[i] + shared_seconds)}
+            else:
+                misses.append((i, embedding))
+
+        # 4. RAG for the misses with bounded parallelism
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(i, embedding):
+            async with semaphore:
+                start_time = time.time() - pending[i] - shared_seconds
+                try:
+                    retrieval = await self.retrieve(queries[i], namespace, embedding)
+                    result = await self.generate(queries[i], retrieval, start_time)
+                    return {"index": i, "query": queries[i], **result}
+                except Exception as e:
+                    return {"index": i, "query": queries[i], "error": str(e)}
+
+        tasks = [asyncio.create_task(run(i, embedding)) for i, embedding in misses]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The stream was closed early (e.g. client disconnect); don't
+            # keep retrieving and generating for nobody
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
 rag_service = RAGService()
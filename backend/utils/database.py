@@ -1,5 +1,9 @@
 import motor.motor_asyncio
 import os
+import time
+from contextlib import contextmanager
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -12,25 +16,162 @@ class MongoDatabase:
         self.client = None
         self.db = None
         self.uri = os.getenv("MONGODB_URI")
-        
+
+        # Pool sizing / timeouts. Defaults match the driver's except for
+        # server selection, which otherwise blocks startup for 30s when
+        # Atlas is unreachable.
+        self.client_options = {
+            "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+            "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+            "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0")) or None,
+            "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+            "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None,
+        }
+        self.slow_op_ms = float(os.getenv("MONGO_SLOW_OP_MS", "200"))
+
+        # collection name -> [IndexModel], created at connect()
+        self.index_specs = {}
+        # "op:collection" -> {"calls", "total_ms", "max_ms"}
+        self.latency = {}
+
     async def connect(self):
         if not self.client:
-            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.uri)
+            options = {k: v for k, v in self.client_options.items() if v is not None}
+            self.client = motor.motor_asyncio.AsyncIOMotorClient(self.uri, **options)
             self.db = self.client.get_default_database()
             print("Connected to MongoDB Atlas")
+            await self.ensure_indexes()
 
     async def disconnect(self):
         if self.client:
             self.client.close()
             print("Disconnected from MongoDB Atlas")
 
+    def register_indexes(self, collection_name, indexes):
+        """Declares indexes for a collection; they are created at connect()."""
+        specs = self.index_specs.setdefault(collection_name, [])
+        known = {spec.document["name"] for spec in specs}
+        for index in indexes:
+            if index.document["name"] not in known:
+                specs.append(index)
+
+    async def ensure_indexes(self, collection_name=None):
+        """Creates registered indexes. Safe to call repeatedly."""
+        names = [collection_name] if collection_name else list(self.index_specs)
+        for name in names:
+            specs = self.index_specs.get(name)
+            if not specs:
+                continue
+            try:
+                with self._timed("create_indexes", name):
+                    await self.db[name].create_indexes(specs)
+            except PyMongoError as e:
+                # A bad index must not take the API down; queries still work
+                print(f"Failed to create indexes on '{name}': {e}")
+
+    @contextmanager
+    def _timed(self, op, collection_name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            key = f"{op}:{collection_name}"
+            stats = self.latency.get(key)
+            if stats is None:
+                stats = self.latency[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed_ms
+            if elapsed_ms > stats["max_ms"]:
+                stats["max_ms"] = elapsed_ms
+            if elapsed_ms >= self.slow_op_ms:
+                print(f"Slow Mongo {op} on '{collection_name}': {elapsed_ms:.1f} ms")
+
+    def get_latency_stats(self):
+        return {
+            key: {
+                "calls": stats["calls"],
+                "avg_ms": round(stats["total_ms"] / stats["calls"], 3),
+                "max_ms": round(stats["max_ms"], 3)
+            }
+            for key, stats in self.latency.items()
+        }
+
     async def insert_document(self, collection_name, data):
         collection = self.db[collection_name]
-        result = await collection.insert_one(data)
+        with self._timed("insert_one", collection_name):
+            result = await collection.insert_one(data)
         return str(result.inserted_id)
 
-    async def get_document(self, collection_name, query):
+    async def get_document(self, collection_name, query, projection=None):
+        collection = self.db[collection_name]
+        with self._timed("find_one", collection_name):
+            return await collection.find_one(query, projection)
+
+    async def insert_many(self, collection_name, documents):
+        if not documents:
+            return []
+        collection = self.db[collection_name]
+        with self._timed("insert_many", collection_name):
+            result = await collection.insert_many(documents, ordered=False)
+        return [str(_id) for _id in result.inserted_ids]
+
+    async def bulk_upsert(self, collection_name, documents, key_fields, unset_fields=None):
+        """Upserts documents in one round trip, matching on key_fields."""
+        if not documents:
+            return 0
+        operations = []
+        for doc in documents:
+            update = {"$set": doc}
+            if unset_fields:
+                update["$unset"] = {field: "" for field in unset_fields}
+            operations.append(UpdateOne({k: doc[k] for k in key_fields}, update, upsert=True))
+        collection = self.db[collection_name]
+        with self._timed("bulk_write", collection_name):
+            result = await collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    async def update_document(self, collection_name, query, update):
+        collection = self.db[collection_name]
+        with self._timed("update_one", collection_name):
+            result = await collection.update_one(query, update)
+        return result.modified_count
+
+    async def delete_document(self, collection_name, query):
         collection = self.db[collection_name]
-        return await collection.find_one(query)
+        with self._timed("delete_one", collection_name):
+            result = await collection.delete_one(query)
+        return result.deleted_count
+
+    async def delete_many(self, collection_name, query):
+        collection = self.db[collection_name]
+        with self._timed("delete_many", collection_name):
+            result = await collection.delete_many(query)
+        return result.deleted_count
+
+    async def find_documents(self, collection_name, query, projection=None):
+        collection = self.db[collection_name]
+        with self._timed("find", collection_name):
+            cursor = collection.find(query, projection)
+            return await cursor.to_list(length=None)
+
+    async def find_in(self, collection_name, field, values, projection=None, extra_query=None):
+        """Fetches every document whose field is in values with a single $in query."""
+        if not values:
+            return []
+        query = {field: {"$in": list(values)}}
+        if extra_query:
+            query.update(extra_query)
+        return await self.find_documents(collection_name, query, projection)
 
-mongo_db = MongoDatabase()
+# MONGO_PROVIDER=memory swaps in a dict-backed store for offline
+# evaluation and replay runs
+if os.getenv("MONGO_PROVIDER") == "memory":
+    try:
+        from backend.utils.memory_database import InMemoryDatabase
+    except ModuleNotFoundError:
+        from utils.memory_database import InMemoryDatabase
+    mongo_db = InMemoryDatabase()
+else:
+    mongo_db = MongoDatabase()
@@ -0,0 +1,118 @@
+import copy
+import itertools
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$gte" and (value is None or value < operand):
+                    return False
+                if op not in ("$in", "$gte"):
+                    raise NotImplementedError(f"Operator {op} is not supported by InMemoryDatabase")
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+class InMemoryDatabase:
+    """
+    Dict-backed stand-in for MongoDatabase (MONGO_PROVIDER=memory). It
+    supports the subset of queries the services use (equality, $in, $gte,
+    $set/$unset), for evaluation and replay runs without a Mongo server.
+    """
+    def __init__(self):
+        self.collections = {}
+        self.index_specs = {}
+        self._ids = itertools.count(1)
+
+    async def connect(self):
+        print("Using in-memory document store")
+
+    async def disconnect(self):
+        pass
+
+    def register_indexes(self, collection_name, indexes):
+        self.index_specs.setdefault(collection_name, []).extend(indexes)
+
+    async def ensure_indexes(self, collection_name=None):
+        pass
+
+    def get_latency_stats(self):
+        return {}
+
+    def _collection(self, name):
+        return self.collections.setdefault(name, [])
+
+    async def insert_document(self, collection_name, data):
+        doc = copy.deepcopy(data)
+        doc.setdefault("_id", next(self._ids))
+        self._collection(collection_name).append(doc)
+        return str(doc["_id"])
+
+    async def get_document(self, collection_name, query, projection=None):
+        for doc in self._collection(collection_name):
+            if _matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def insert_many(self, collection_name, documents):
+        return [await self.insert_document(collection_name, doc) for doc in documents]
+
+    async def bulk_upsert(self, collection_name, documents, key_fields, unset_fields=None):
+        for doc in documents:
+            update = {"$set": doc}
+            if unset_fields:
+                update["$unset"] = {field: "" for field in unset_fields}
+            if not await self.update_document(collection_name, {k: doc[k] for k in key_fields}, update):
+                await self.insert_document(collection_name, doc)
+        return len(documents)
+
+    async def update_document(self, collection_name, query, update):
+        for doc in self._collection(collection_name):
+            if _matches(doc, query):
+                doc.update(copy.deepcopy(update.get("$set", {})))
+                for field in update.get("$unset", {}):
+                    doc.pop(field, None)
+                return 1
+        return 0
+
+    async def delete_document(self, collection_name, query):
+        docs = self._collection(collection_name)
+        for i, doc in enumerate(docs):
+            if _matches(doc, query):
+                del docs[i]
+                return 1
+        return 0
+
+    async def delete_many(self, collection_name, query):
+        docs = self._collection(collection_name)
+        kept = [doc for doc in docs if not _matches(doc, query)]
+        self.collections[collection_name] = kept
+        return len(docs) - len(kept)
+
+    async def find_documents(self, collection_name, query, projection=None):
+        return [_project(doc, projection) for doc in self._collection(collection_name) if _matches(doc, query)]
+
+    async def find_in(self, collection_name, field, values, projection=None, extra_query=None):
+        if not values:
+            return []
+        query = {field: {"$in": set(values)}}
+        if extra_query:
+            query.update(extra_query)
+        return await self.find_documents(collection_name, query, projection)
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class VectorMatch:
+    def __init__(self, id, score, metadata):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+
+class QueryResult:
+    def __init__(self, matches):
+        self.matches = matches
+
+
+class InMemoryVectorDB:
+    """
+    Brute-force cosine stand-in for VectorDB (VECTOR_DB_PROVIDER=memory).
+    It has the same interface and namespace semantics, and is used for
+    evaluation and replay runs without a Pinecone account.
+    """
+    def __init__(self):
+        self.index_name = "in-memory"
+        # namespace -> {id: (unit vector, metadata)}
+        self.namespaces = {}
+        self._matrices = {}
+
+    def connect(self):
+        print("Using in-memory vector store")
+
+    def upsert_vectors(self, vectors, namespace=""):
+        store = self.namespaces.setdefault(namespace, {})
+        for vector in vectors:
+            values = np.asarray(vector["values"], dtype=np.float32)
+            norm = np.linalg.norm(values)
+            store[vector["id"]] = (values / norm if norm else values, vector.get("metadata", {}))
+        self._matrices.pop(namespace, None)
+
+    def delete_vectors(self, ids, namespace="", batch_size=1000):
+        store = self.namespaces.get(namespace, {})
+        for vector_id in ids:
+            store.pop(vector_id, None)
+        self._matrices.pop(namespace, None)
+
+    def query_vectors(self, query_vector, top_k=10, include_metadata=True, namespace=""):
+        store = self.namespaces.get(namespace)
+        if not store:
+            return QueryResult([])
+
+        cached = self._matrices.get(namespace)
+        if cached is None:
+            ids = list(store)
+            cached = self._matrices[namespace] = (ids, np.stack([store[i][0] for i in ids]))
+        ids, matrix = cached
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm if norm else query)
+        top = np.argsort(-scores)[:top_k]
+        return QueryResult([
+            VectorMatch(ids[i], float(scores[i]), store[ids[i]][1] if include_metadata else {})
+            for i in top
+        ])
@@ -0,0 +1,95 @@
+import numpy as np
+
+# Bits set per byte value, for Hamming distance on packed sign codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Rows converted to float32 at a time during a scan, bounding scratch memory
+SCAN_BLOCK_ROWS = 4096
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row (in float32) so cosine similarity is a dot product."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        norm = np.linalg.norm(matrix)
+        return matrix / norm if norm else matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def to_float16_blob(vector) -> bytes:
+    """Serializes a normalized vector as little-endian float16 bytes (for Mongo)."""
+    return normalize_rows(vector).astype("<f2").tobytes()
+
+
+def from_float16_blob(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype="<f2")
+
+
+def quantize_int8(matrix: np.ndarray):
+    """
+    Symmetric per-row int8 quantization: row ~= codes * scale.
+    Returns (codes int8 [n, d], scales float32 [n]).
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def binary_codes(matrix: np.ndarray) -> np.ndarray:
+    """Packs the sign bit of every dimension: [n, d] -> uint8 [n, ceil(d / 8)]."""
+    return np.packbits(np.asarray(matrix) > 0, axis=-1)
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    return _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+
+
+def scan_float16(vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Dot products of float16 rows with a float32 query, block by block."""
+    scores = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+        scores[start:start + len(block)] = block @ query
+    return scores
+
+
+def scan_int8(codes: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Approximate dot products from int8 rows and their per-row scales."""
+    scores = np.empty(len(codes), dtype=np.float32)
+    for start in range(0, len(codes), SCAN_BLOCK_ROWS):
+        block = codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+        scores[start:start + len(block)] = (block @ query) * scales[start:start + len(block)]
+    return scores
+
+
+def best_matches_float16(vectors: np.ndarray, queries: np.ndarray):
+    """
+    Best row (and its score) for every query, as blocked matrix-matrix
+    products. Keeps only a running max, so memory stays
+    O(queries x block) even for large indexes.
+    """
+    best_scores = np.full(len(queries), -np.inf, dtype=np.float32)
+    best_rows = np.zeros(len(queries), dtype=np.int64)
+    for start in range(0, len(vectors), SCAN_BLOCK_ROWS):
+        block = vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32)
+        scores = queries @ block.T
+        block_best = np.argmax(scores, axis=1)
+        block_scores = scores[np.arange(len(queries)), block_best]
+        improved = block_scores > best_scores
+        best_scores[improved] = block_scores[improved]
+        best_rows[improved] = block_best[improved] + start
+    return best_scores, best_rows
+
+
+def top_candidates(scores: np.ndarray, k: int, largest: bool = True) -> np.ndarray:
+    """Indices of the k best scores, unordered."""
+    k = min(k, len(scores))
+    if k == len(scores):
+        return np.arange(len(scores))
+    if largest:
+        return np.argpartition(-scores, k - 1)[:k]
+    return np.argpartition(scores, k - 1)[:k]
@@ -0,0 +1,113 @@
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker dev setups, no cross-process lock
+    fcntl = None
+
+
+def default_shared_dir() -> Path:
+    # /dev/shm is RAM-backed on Linux, so the mapped files never touch disk
+    base = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    return base / "mini-rag-faq"
+
+
+class SharedIndexStore:
+    """
+    Publishes a set of numpy arrays plus a JSON payload as one numbered
+    generation on disk. Other processes memory-map them read-only.
+
+    Layout under `root`:
+        manifest.json       {"generation", "fingerprint", "arrays", ...}
+        gen-<N>/<name>.npy  one file per array
+        gen-<N>/payload.json
+        .lock               serializes builders across workers
+    """
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.json"
+
+    @asynccontextmanager
+    async def lock(self):
+        """Exclusive cross-process lock, so only one worker builds at a time."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "a+") as lock_file:
+            if fcntl:
+                await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def manifest_mtime(self) -> float:
+        try:
+            return self.manifest_path.stat().st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def publish(self, arrays: Dict[str, np.ndarray], payload, fingerprint: str, **extra) -> Dict:
+        """Writes a new generation and atomically points the manifest at it. Call under lock()."""
+        previous = self.read_manifest()
+        generation = (previous["generation"] + 1) if previous else 1
+
+        gen_dir = self.root / f"gen-{generation}"
+        tmp_dir = self.root / f"gen-{generation}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        with open(tmp_dir / "payload.json", "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+        shutil.rmtree(gen_dir, ignore_errors=True)
+        os.replace(tmp_dir, gen_dir)
+
+        manifest = {
+            "generation": generation,
+            "fingerprint": fingerprint,
+            "arrays": sorted(arrays),
+            **extra
+        }
+        tmp_manifest = self.root / "manifest.json.tmp"
+        with open(tmp_manifest, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, self.manifest_path)
+
+        # Keep the previous generation for workers that have not re-attached
+        # yet; anything older is unused. Mapped files stay readable after
+        # unlinking on POSIX.
+        for old in self.root.glob("gen-*"):
+            suffix = old.name[len("gen-"):]
+            if suffix.isdigit() and int(suffix) < generation - 1:
+                shutil.rmtree(old, ignore_errors=True)
+
+        return manifest
+
+    def attach(self, manifest: Dict):
+        """Memory-maps a published generation read-only. Returns (arrays, payload)."""
+        gen_dir = self.root / f"gen-{manifest['generation']}"
+        arrays = {
+            name: np.load(gen_dir / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+            for name in manifest["arrays"]
+        }
+        with open(gen_dir / "payload.json", "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        return arrays, payload
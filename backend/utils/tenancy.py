@@ -0,0 +1,31 @@
+import os
+import re
+
+# Pinecone's default namespace is "", which is where every vector ingested
+# before tenants existed lives. Keeping it as the default tenant means no
+# re-indexing is needed.
+DEFAULT_NAMESPACE = ""
+
+# Namespaces partition data; they are not an access boundary. The namespace
+# comes from the request body, and /query is public.
+
+# Tenant names end up in Pinecone namespaces, Mongo collection names and file
+# paths, so only allow a conservative character set.
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Where per-tenant FAQ files live: data/tenants/<namespace>/faqs.json
+TENANT_DATA_DIR = os.getenv("TENANT_DATA_DIR", "tenants")
+
+
+def resolve_namespace(namespace) -> str:
+    """Validates a tenant namespace. None/empty maps to the default tenant."""
+    if namespace is None:
+        return DEFAULT_NAMESPACE
+    namespace = namespace.strip()
+    if not namespace:
+        return DEFAULT_NAMESPACE
+    if not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(
+            "Invalid namespace: use 1-64 letters, digits, '-' or '_'"
+        )
+    return namespace
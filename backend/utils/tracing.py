@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "1000"))
+SLOW_QUERY_LOG = Path(os.getenv("SLOW_QUERY_LOG") or Path(__file__).parent.parent / "logs" / "slow_queries.jsonl")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+
+# The trace of the request being served. asyncio tasks and to_thread calls
+# copy the context, so services can record into it without it being passed
+# through every call.
+_current_trace: ContextVar[Optional["QueryTrace"]] = ContextVar("current_trace", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def get_current_trace() -> Optional["QueryTrace"]:
+    return _current_trace.get()
+
+
+class QueryTrace:
+    """Structured record of one /query: decisions, ids, scores and stage timings."""
+    def __init__(self, request_id: str, query: str, namespace: str = ""):
+        self.request_id = request_id
+        self.query = query
+        self.namespace = namespace
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.total_ms = None
+        self.outcome = None # faq_exact | faq_semantic | rag | error
+        self.error = None
+        self.stages: Dict[str, float] = {}
+        self.faq: Dict = {}
+        self.retrieval: List[Dict] = []
+        self.rerank: List[Dict] = []
+        self.prompt_tokens = None
+        self.total_tokens = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Work still running after finish() (e.g. retrieval cancelled
+            # after an FAQ hit) is not part of the recorded request
+            if self.total_ms is None:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.stages[name] = round(self.stages.get(name, 0.0) + elapsed_ms, 3)
+
+    def finish(self, outcome: str, error: Optional[str] = None):
+        self.outcome = outcome
+        self.error = error
+        self.total_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_dict(self) -> Dict:
+        # Copies, so later writes to this trace do not change a recorded one
+        return {
+            "request_id": self.request_id,
+            "query": self.query,
+            "namespace": self.namespace,
+            "started_at": self.started_at,
+            "total_ms": self.total_ms,
+            "outcome": self.outcome,
+            "error": self.error,
+            "stages_ms": dict(self.stages),
+            "faq": dict(self.faq),
+            "retrieval": list(self.retrieval),
+            "rerank": list(self.rerank),
+            "prompt_tokens": self.prompt_tokens,
+            "total_tokens": self.total_tokens,
+        }
+
+
+@contextmanager
+def trace_stage(name: str):
+    """Times a stage on the current trace; a no-op outside a traced request."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+@contextmanager
+def start_trace(trace: QueryTrace):
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class TraceRecorder:
+    """
+    Keeps the last TRACE_BUFFER_SIZE traces in memory and appends traces
+    slower than SLOW_QUERY_MS to a JSONL log. The file write runs in the
+    default executor, off the request path.
+    """
+    def __init__(self, buffer_size: int = TRACE_BUFFER_SIZE, slow_query_ms: float = SLOW_QUERY_MS,
+                 slow_log_path: Path = SLOW_QUERY_LOG):
+        self.buffer = deque(maxlen=buffer_size)
+        self.slow_query_ms = slow_query_ms
+        self.slow_log_path = Path(slow_log_path)
+        self._write_lock = threading.Lock()
+
+    def record(self, trace: QueryTrace):
+        data = trace.to_dict()
+        self.buffer.append(data)
+        if trace.total_ms is not None and trace.total_ms >= self.slow_query_ms:
+            line = json.dumps(data, ensure_ascii=False, default=str)
+            try:
+                asyncio.get_running_loop().run_in_executor(None, self._append, line)
+            except RuntimeError:
+                self._append(line)
+
+    def _append(self, line: str):
+        try:
+            with self._write_lock:
+                self.slow_log_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.slow_log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            print(f"Failed to write slow query log: {e}")
+
+    def recent(self, limit: int = 50, slow_only: bool = False) -> List[Dict]:
+        traces = [t for t in reversed(self.buffer) if not slow_only or (t["total_ms"] or 0) >= self.slow_query_ms]
+        return traces[:limit]
+
+    def get(self, request_id: str) -> Optional[Dict]:
+        for trace in reversed(self.buffer):
+            if trace["request_id"] == request_id:
+                return trace
+        return None
+
+
+trace_recorder = TraceRecorder()
@@ -29,14 +29,32 @@ class VectorDB:
         self.index = self.pc.Index(self.index_name)
         print(f"Connected to Pinecone index: {self.index_name}")
 
-    def upsert_vectors(self, vectors):
-        return self.index.upsert(vectors=vectors)
+    def upsert_vectors(self, vectors, namespace=""):
+        # Each tenant gets its own Pinecone namespace, so a query only scans
+        # that tenant's vectors. "" is Pinecone's default namespace.
+        return self.index.upsert(vectors=vectors, namespace=namespace)
 
-    def query_vectors(self, query_vector, top_k=10, include_metadata=True):
+    def delete_vectors(self, ids, namespace="", batch_size=1000):
+        # Pinecone accepts at most 1000 ids per delete call
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            self.index.delete(ids=ids[start:start + batch_size], namespace=namespace)
+
+    def query_vectors(self, query_vector, top_k=10, include_metadata=True, namespace=""):
         return self.index.query(
             vector=query_vector,
             top_k=top_k,
-            include_metadata=include_metadata
+            include_metadata=include_metadata,
+            namespace=namespace
         )
 
-vector_db = VectorDB()
+# VECTOR_DB_PROVIDER=memory swaps in a brute-force store for offline
+# evaluation and replay runs
+if os.getenv("VECTOR_DB_PROVIDER") == "memory":
+    try:
+        from backend.utils.memory_vector_db import InMemoryVectorDB
+    except ModuleNotFoundError:
+        from utils.memory_vector_db import InMemoryVectorDB
+    vector_db = InMemoryVectorDB()
+else:
+    vector_db = VectorDB()